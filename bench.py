@@ -0,0 +1,227 @@
+"""Headless benchmark for the board engine and the render loop.
+
+Runs with the SDL dummy video driver, so no window is opened. For every board
+size and mine density it times:
+
+    generate      Board() + place_mines()          (was create_random_bombs)
+    reveal        first reveal and its flood fill  (was check_neighbor_states)
+    update        MineField.update()
+    game_board    Game.update_game_board()
+    draw          Game.draw_cells(), incremental and full redraw
+    frame         one whole play frame, input to display update
+
+and reports means, percentiles and peak traced memory as JSON. It also starts
+the game in fresh processes to time startup to the first menu frame, cold
+(empty sprite cache, sheets decoded and baked) and warm (baked cache loaded).
+
+    python3 bench.py --sizes 16,256,1024 --densities 0.12,0.2 --output bench.json
+"""
+import argparse, contextlib, json, os, platform, random, shutil, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import engine
+import main
+
+
+def summarize(samples) -> dict:
+    """Timing summary in milliseconds for a list of perf_counter deltas in seconds."""
+    ms = sorted(s*1000 for s in samples)
+    def pct(p):
+        return ms[min(len(ms)-1, int(round(p/100*(len(ms)-1))))]
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "min_ms": ms[0],
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ms[-1],
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_generation(width, height, mines, repeat, seed) -> dict:
+    build = []
+    reveal = []
+    for i in range(repeat):
+        board = engine.Board(width, height, mines, seed+i)
+        centre = board.index(width//2, height//2)
+        build.append(timed(board.place_mines, centre)[0])
+        reveal.append(timed(board.reveal_index, centre)[0])
+
+    tracemalloc.start()
+    board = engine.Board(width, height, mines, seed)
+    board.place_mines(board.index(width//2, height//2))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"generate": summarize(build), "reveal": summarize(reveal), "board_peak_bytes": peak}
+
+
+def bench_frames(game, width, height, mines, frames, seed) -> dict:
+    """Drive the play screen with one random click per frame and time each phase."""
+    rng = random.Random(seed)
+    game.settings.set_board(width, height, mines)
+    game.settings.data['seed'] = seed
+    game.settings.data['record_replays'] = False
+    game.new_board()
+    game.menu_state = 'play'
+    game.drawn_state = 'play'
+    camera = game.camera
+
+    phases = {name: [] for name in ("input", "update", "game_board", "draw", "check", "present", "frame")}
+    full_draw = []
+    games_lost = 0
+    for frame in range(frames):
+        frame_start = time.perf_counter()
+
+        x0, x1, y0, y1 = camera.visible_cells()
+        sx, sy = camera.cell_to_screen(rng.randrange(x0, x1), rng.randrange(y0, y1))
+        pos = (sx + camera.cell_size//2, sy + camera.cell_size//2)
+        button = pygame.BUTTON_RIGHT if rng.random() < 0.2 else pygame.BUTTON_LEFT
+        t = time.perf_counter()
+        game.grid.handle_mouse_down(pos, button)
+        game.grid.handle_mouse_up(pos, button)
+        phases["input"].append(time.perf_counter() - t)
+
+        phases["update"].append(timed(game.grid.update)[0])
+        phases["game_board"].append(timed(game.update_game_board)[0])
+        phases["draw"].append(timed(game.draw_cells)[0])
+        elapsed, (win_check, endbomb) = timed(game.check_bombs)
+        phases["check"].append(elapsed)
+        phases["present"].append(timed(game.present)[0])
+        phases["frame"].append(time.perf_counter() - frame_start)
+
+        if win_check != 0:
+            games_lost += win_check == -1
+            game.grid.reset_grid(seed+frame)
+            game.full_redraw = True
+
+        if frame % 10 == 0:
+            game.full_redraw = True
+            full_draw.append(timed(game.draw_cells)[0])
+
+    result = {name: summarize(samples) for name, samples in phases.items()}
+    result["draw_full"] = summarize(full_draw)
+    # cells a full redraw blits, to compare draw_full per tile across board sizes
+    x0, x1, y0, y1 = camera.visible_cells()
+    result["tiles_drawn"] = (x1-x0)*(y1-y0)
+    result["games_ended"] = games_lost
+    return result
+
+
+# run in a child process: time the imports, Game() and the first menu frame
+STARTUP_SNIPPET = r"""
+import time
+start = time.perf_counter()
+import contextlib, json, os, sys
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+with contextlib.redirect_stdout(sys.stderr):
+    import pygame, main
+    imported = time.perf_counter()
+    main.SPRITE_CACHE_DIR = sys.argv[1]
+    game = main.Game()
+    created = time.perf_counter()
+    game.drawn_state = game.menu_state
+    game.update_menu()
+    game.present()
+    drawn = time.perf_counter()
+print(json.dumps({"imports": imported-start, "game_init": created-imported,
+                  "first_frame": drawn-created, "total": drawn-start}))
+"""
+
+
+def startup_run(cache_dir) -> dict:
+    result = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET, cache_dir],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def bench_startup(runs) -> dict:
+    """Time fresh game processes with an empty sprite cache (cold) and a baked one (warm)."""
+    cold = []
+    for _ in range(runs):
+        cache_dir = tempfile.mkdtemp(prefix="pysweeper-cache-")
+        try:
+            cold.append(startup_run(cache_dir))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    cache_dir = tempfile.mkdtemp(prefix="pysweeper-cache-")
+    try:
+        startup_run(cache_dir)
+        warm = [startup_run(cache_dir) for _ in range(runs)]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {mode: {phase: summarize([run[phase] for run in samples]) for phase in samples[0]}
+            for mode, samples in (("cold", cold), ("warm", warm))}
+
+
+def main_bench(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="16,64,256,1024", help="comma separated square board sizes")
+    parser.add_argument("--densities", default="0.12,0.16,0.2", help="comma separated mine densities")
+    parser.add_argument("--frames", type=int, default=200, help="play frames per configuration")
+    parser.add_argument("--repeat", type=int, default=10, help="board generations per configuration")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold and warm startups to time, 0 skips them")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": getattr(engine.numpy, "__version__", None),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        },
+        "results": [],
+    }
+    if args.startup_runs > 0:
+        print("bench startup", file=sys.stderr)
+        report["startup"] = bench_startup(args.startup_runs)
+    # the game logs to stdout, keep it clear for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        game = main.Game()
+        for size in [int(s) for s in args.sizes.split(",")]:
+            for density in [float(d) for d in args.densities.split(",")]:
+                mines = max(1, int(size*size*density))
+                print(f"bench {size}x{size}, {mines} mines")
+                entry = {"width": size, "height": size, "mines": mines, "density": density}
+                entry.update(bench_generation(size, size, mines, args.repeat, args.seed))
+                entry["frames"] = bench_frames(game, size, size, mines, args.frames, args.seed)
+                report["results"].append(entry)
+
+    if resource is not None:
+        report["meta"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as wfp:
+            wfp.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main_bench()
+    pygame.quit()
@@ -0,0 +1,287 @@
+"""Headless, pygame-free Minesweeper engine.
+
+Every cell is an index ``y*width + x`` into a handful of parallel ``bytearray``
+columns (mines, revealed, flagged, adjacency counts) instead of one Python
+object per tile, so boards of millions of cells stay a few bytes per cell.
+
+The rules live here so bots, simulations and tests can play without a display::
+
+    game = new_game(9, 9, 10, seed=1)
+    game.reveal(4, 4)
+    game.toggle_flag(0, 0)
+    game.chord(4, 4)
+    game.status()   # STATUS_PLAYING, STATUS_WON or STATUS_LOST
+
+``Game`` in main.py renders from the same Board.
+"""
+import collections, functools, itertools, random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+STATUS_LOST = -1
+STATUS_PLAYING = 0
+STATUS_WON = 1
+
+# below this many cells the plain Python paths beat NumPy's call overhead
+NUMPY_MIN_SIZE = 4096
+
+# maps 0 <-> 1 for bytes.translate
+_INVERT = bytes([1, 0]) + bytes(254)
+
+NEIGHBOR_OFFSETS = ((-1, -1), (0, -1), (1, -1),
+                    (-1, 0),           (1, 0),
+                    (-1, 1),  (0, 1),  (1, 1))
+
+
+@functools.lru_cache(maxsize=8)
+def neighbor_table(width, height) -> tuple:
+    """Precompute neighbour lookups for one board size.
+
+    Returns ``(edges, offset_sets)``: ``edges`` holds an edge class per cell
+    (interior, left/right/top/bottom border or both) and ``offset_sets`` maps
+    each class to the flat index offsets of the neighbours that exist there.
+    """
+    # 0 = interior, 1 = low edge, 2 = high edge, 3 = both (a 1-cell wide line)
+    def edge_classes(length):
+        if length == 1:
+            return [3]
+        return [1] + [0]*(length-2) + [2]
+
+    offset_sets = []
+    for cls in range(16):
+        col_cls, row_cls = divmod(cls, 4)
+        offsets = []
+        for dx, dy in NEIGHBOR_OFFSETS:
+            if dx == -1 and col_cls in (1, 3) or dx == 1 and col_cls in (2, 3):
+                continue
+            if dy == -1 and row_cls in (1, 3) or dy == 1 and row_cls in (2, 3):
+                continue
+            offsets.append(dy*width + dx)
+        offset_sets.append(tuple(offsets))
+
+    col_classes = edge_classes(width)
+    rows = {row_cls: bytes(col_cls*4 + row_cls for col_cls in col_classes) for row_cls in range(4)}
+    edges = b''.join(rows[row_cls] for row_cls in edge_classes(height))
+    return edges, tuple(offset_sets)
+
+
+class Board:
+    """Board state for one game.
+
+    Mines are placed lazily by ``place_mines()`` on the first reveal so the
+    first click is always safe. The layout is fully determined by ``seed`` and
+    ``safe_index``, so any board can be regenerated exactly.
+    """
+    def __init__(self, width, height, mine_count, seed=None, safe_radius=1):
+        self.width = width
+        self.height = height
+        self.size = width*height
+        self.mine_count = min(mine_count, max(self.size-1, 0))
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        # 0 keeps only the first clicked cell free of mines, 1 keeps its 3x3 block free
+        self.safe_radius = safe_radius
+        self.safe_index = None
+        self.mines_placed = False
+        self.mines = bytearray(self.size)
+        self.revealed = bytearray(self.size)
+        self.flagged = bytearray(self.size)
+        self.counts = bytearray(self.size)
+        self.edges, self.offset_sets = neighbor_table(width, height)
+        self.mine_indices = []
+        self.flags = set()
+        # running counters kept up to date by every move, so status() never scans the board
+        self.safe_left = self.size - self.mine_count
+        self.correct_flags = 0
+        # the mine that ended the game, if one was revealed
+        self.exploded = None
+
+    def index(self, x, y) -> int:
+        return y*self.width + x
+
+    def coords(self, index) -> tuple:
+        y, x = divmod(index, self.width)
+        return x, y
+
+    def neighbors(self, index) -> list:
+        return [index + offset for offset in self.offset_sets[self.edges[index]]]
+
+    def safe_zone(self, safe_index) -> list:
+        """Return the sorted cells kept free of mines for a first click on safe_index."""
+        if safe_index is None:
+            return []
+        zone = [safe_index]
+        if self.safe_radius > 0:
+            zone += self.neighbors(safe_index)
+        # fall back to a single safe cell when the board is too dense for the block
+        if self.size - len(zone) < self.mine_count:
+            zone = [safe_index]
+        return sorted(zone)
+
+    def place_mines(self, safe_index=None) -> None:
+        """Place the mines by sampling flat indices without replacement, skipping the safe zone.
+
+        At most half the cells are ever drawn from the RNG, so the cost stays predictable at
+        any density.
+        """
+        self.safe_index = safe_index
+        excluded = self.safe_zone(safe_index)
+        limit = self.size - len(excluded)
+        # sample from the first `limit` cells, excluded cells in that range stand in for the free tail cells
+        tail = [i for i in range(limit, self.size) if i not in excluded]
+        remap = dict(zip([i for i in excluded if i < limit], tail))
+        rng = random.Random(self.seed)
+        if self.mine_count*2 <= limit:
+            picks = rng.sample(range(limit), self.mine_count)
+        else:
+            # dense boards sample the free cells instead and take the rest as mines
+            free = bytearray(limit)
+            for index in rng.sample(range(limit), limit-self.mine_count):
+                free[index] = 1
+            picks = list(itertools.compress(range(limit), free.translate(_INVERT)))
+        mine_list = [remap.get(i, i) for i in picks] if remap else picks
+
+        mines = self.mines
+        mines[:] = bytes(self.size)
+        if numpy is not None and self.size >= NUMPY_MIN_SIZE:
+            numpy.frombuffer(mines, dtype=numpy.uint8)[numpy.array(mine_list, dtype=numpy.intp)] = 1
+        else:
+            for index in mine_list:
+                mines[index] = 1
+
+        self.mine_indices = mine_list
+        self.mines_placed = True
+        self.compute_counts()
+        self.recount()
+
+    def compute_counts(self) -> None:
+        """Fill ``counts`` with the number of mines around every cell."""
+        if numpy is not None and self.size >= NUMPY_MIN_SIZE:
+            self._compute_counts_numpy()
+            return
+
+        counts = self.counts
+        counts[:] = bytes(self.size)
+        edges = self.edges
+        offset_sets = self.offset_sets
+        for index in self.mine_indices:
+            for offset in offset_sets[edges[index]]:
+                counts[index+offset] += 1
+
+    def _compute_counts_numpy(self) -> None:
+        h, w = self.height, self.width
+        mines = numpy.frombuffer(self.mines, dtype=numpy.uint8).reshape(h, w)
+        padded = numpy.pad(mines, 1)
+        total = numpy.zeros((h, w), dtype=numpy.uint8)
+        for dx, dy in NEIGHBOR_OFFSETS:
+            total += padded[1+dy:1+dy+h, 1+dx:1+dx+w]
+        self.counts[:] = total.tobytes()
+
+    def recount(self) -> None:
+        """Rebuild the running counters from the cell columns, after placing mines or loading a board."""
+        revealed = self.revealed
+        revealed_mines = sum(revealed[index] for index in self.mine_indices)
+        self.safe_left = self.size - self.mine_count - (revealed.count(1) - revealed_mines)
+        self.correct_flags = sum(self.mines[index] for index in self.flags)
+
+    def status(self) -> int:
+        """O(1) game state: lost on a revealed mine, won once every safe cell is revealed or every mine is flagged."""
+        if self.exploded is not None:
+            return STATUS_LOST
+        if self.mines_placed and (self.safe_left == 0 or self.correct_flags == len(self.flags) == self.mine_count):
+            return STATUS_WON
+        return STATUS_PLAYING
+
+    def reveal_index(self, index) -> list:
+        """Reveal a cell and flood outwards through every connected empty cell in one pass.
+
+        Returns the indices of every cell whose state changed, none once the game is over.
+        """
+        if self.flagged[index] or self.revealed[index] or self.status() != STATUS_PLAYING:
+            return []
+        if not self.mines_placed:
+            self.place_mines(index)
+
+        revealed = self.revealed
+        revealed[index] = 1
+        changed = [index]
+        if self.mines[index]:
+            self.exploded = index
+            return changed
+        self.safe_left -= 1
+
+        counts = self.counts
+        flagged = self.flagged
+        edges = self.edges
+        offset_sets = self.offset_sets
+        if counts[index] > 0:
+            return changed
+
+        # only empty cells are queued, and an empty cell never has a mine next to it
+        flags = self.flags
+        queue = collections.deque([index])
+        while queue:
+            current = queue.popleft()
+            for offset in offset_sets[edges[current]]:
+                neighbor = current + offset
+                if revealed[neighbor]:
+                    continue
+                if flagged[neighbor]:
+                    flagged[neighbor] = 0
+                    flags.discard(neighbor)
+
+                revealed[neighbor] = 1
+                changed.append(neighbor)
+                if counts[neighbor] == 0:
+                    queue.append(neighbor)
+        self.safe_left -= len(changed) - 1
+        return changed
+
+    def toggle_flag_index(self, index) -> list:
+        # a finished game keeps its result, unflagging a mine must not undo a win
+        if self.revealed[index] or self.status() != STATUS_PLAYING:
+            return []
+        if self.flagged[index]:
+            self.flagged[index] = 0
+            self.flags.discard(index)
+            self.correct_flags -= self.mines[index]
+        elif len(self.flags) < self.mine_count:
+            self.flagged[index] = 1
+            self.flags.add(index)
+            self.correct_flags += self.mines[index]
+        else:
+            return []
+        return [index]
+
+    def chord_index(self, index) -> list:
+        """Reveal the unflagged neighbours of a number once all of its mines are flagged."""
+        if not self.revealed[index] or self.mines[index] or self.counts[index] == 0 or self.status() != STATUS_PLAYING:
+            return []
+
+        neighbors = self.neighbors(index)
+        if sum(self.flagged[n] for n in neighbors) != self.counts[index]:
+            return []
+
+        changed = []
+        for neighbor in neighbors:
+            changed += self.reveal_index(neighbor)
+        return changed
+
+    def reveal(self, x, y) -> list:
+        return self.reveal_index(y*self.width + x)
+
+    def toggle_flag(self, x, y) -> list:
+        return self.toggle_flag_index(y*self.width + x)
+
+    def chord(self, x, y) -> list:
+        return self.chord_index(y*self.width + x)
+
+
+def new_game(width, height, mines, seed=None, safe_radius=1) -> Board:
+    """Start a headless game, mines are placed around the first reveal."""
+    return Board(width, height, mines, seed, safe_radius)
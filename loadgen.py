@@ -0,0 +1,194 @@
+"""Load generator for server.py.
+
+Opens ``--connections`` sockets and plays ``--sessions`` games at once spread
+over them. Every session keeps exactly one request in flight: it reveals a
+random cell it has not seen revealed (or toggles a flag, ``--flag-ratio`` of
+the time), and restarts its board when the game ends. Requests on one socket
+are pipelined, so this measures the server rather than round trips. Prints
+moves per second and reply latency percentiles::
+
+    python3 main.py serve --port 8765 &
+    python3 loadgen.py --port 8765 --connections 20 --sessions 2000 --duration 10
+"""
+import argparse, asyncio, json, random, sys, time
+
+from server import CELL_FLAG, CELL_HIDDEN
+
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class Slot:
+    """One simulated player, the id of its requests is its slot number."""
+    __slots__ = ("id", "key", "size", "known", "sent")
+
+    def __init__(self, slot_id):
+        self.id = slot_id
+        self.key = None
+        self.size = 0
+        self.known = None
+        self.sent = 0.0
+
+
+class Client(asyncio.Protocol):
+    def __init__(self, load, slot_ids):
+        self.load = load
+        self.slots = {i: Slot(i) for i in slot_ids}
+        self.rng = random.Random(load.args.seed*1000003 + slot_ids[0])
+        self.transport = None
+        self.buffer = bytearray()
+        self.out = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        args = self.load.args
+        for slot in self.slots.values():
+            self.send(slot, {"op": "new", "width": args.width, "height": args.height, "mines": args.mines})
+        self.flush()
+
+    def send(self, slot, request) -> None:
+        request["id"] = slot.id
+        slot.sent = time.perf_counter()
+        self.out.append((_encode(request) + "\n").encode())
+
+    def flush(self) -> None:
+        if self.out:
+            self.transport.write(b"".join(self.out))
+            self.out = []
+
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            return
+        lines = buffer[:end].split(b"\n")
+        del buffer[:end+1]
+        now = time.perf_counter()
+        for line in lines:
+            self.reply(json.loads(line), now)
+        self.flush()
+
+    def reply(self, reply, now) -> None:
+        load = self.load
+        slot = self.slots[reply["id"]]
+        load.latencies.append(now - slot.sent)
+        if "error" in reply:
+            load.errors += 1
+            slot.key = None
+        elif "session" in reply:
+            if "width" in reply:
+                slot.key = reply["session"]
+            slot.size = load.args.width*load.args.height
+            slot.known = bytearray(slot.size)
+        else:
+            load.moves += 1
+            known = slot.known
+            for index, code in reply["changed"]:
+                known[index] = code != CELL_HIDDEN and code != CELL_FLAG
+            if reply["status"] != 0:
+                load.games += 1
+                self.send(slot, {"op": "restart", "session": slot.key})
+                return
+        if load.stopping:
+            return
+        if slot.key is None:
+            args = load.args
+            self.send(slot, {"op": "new", "width": args.width, "height": args.height, "mines": args.mines})
+            return
+
+        rng = self.rng
+        while True:
+            index = rng.randrange(slot.size)
+            if not slot.known[index]:
+                break
+        op = "flag" if rng.random() < load.args.flag_ratio else "reveal"
+        self.send(slot, {"op": op, "session": slot.key, "cell": index})
+
+
+class Load:
+    def __init__(self, args):
+        self.args = args
+        self.moves = 0
+        self.games = 0
+        self.errors = 0
+        self.latencies = []
+        self.stopping = False
+
+
+def percentile(samples, fraction) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered)-1, int(fraction*len(ordered)))]
+
+
+async def run(args) -> dict:
+    load = Load(args)
+    loop = asyncio.get_running_loop()
+    per_connection = -(-args.sessions//args.connections)
+    transports = []
+    for c in range(args.connections):
+        slot_ids = list(range(c*per_connection, min((c+1)*per_connection, args.sessions)))
+        if not slot_ids:
+            break
+        if args.unix:
+            transport, client = await loop.create_unix_connection(lambda: Client(load, slot_ids), args.unix)
+        else:
+            transport, client = await loop.create_connection(lambda: Client(load, slot_ids), args.host, args.port)
+        transports.append(transport)
+
+    # the first second only fills the sessions, it is not measured
+    await asyncio.sleep(min(1.0, args.duration/10))
+    load.moves = 0
+    load.latencies = []
+    start = time.perf_counter()
+    last, last_moves = start, 0
+    while time.perf_counter() - start < args.duration:
+        await asyncio.sleep(min(args.interval, args.duration))
+        now = time.perf_counter()
+        print(f"{load.moves:>10} moves  {(load.moves-last_moves)/(now-last):10.0f} moves/s  "
+              f"p50 {percentile(load.latencies[-20000:], 0.5)*1000:7.2f} ms", file=sys.stderr, flush=True)
+        last, last_moves = now, load.moves
+    elapsed = time.perf_counter() - start
+    load.stopping = True
+    for transport in transports:
+        transport.close()
+
+    return {"connections": len(transports), "sessions": args.sessions, "board": [args.width, args.height],
+            "mines": args.mines, "elapsed_s": elapsed, "moves": load.moves, "moves_per_s": load.moves/elapsed,
+            "games_finished": load.games, "errors": load.errors,
+            "latency_ms": {"p50": percentile(load.latencies, 0.5)*1000, "p99": percentile(load.latencies, 0.99)*1000,
+                           "max": max(load.latencies, default=0.0)*1000}}
+
+
+def main_loadgen(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=2000, help="games played at once, spread over the connections")
+    parser.add_argument("--board", default="9x9", help="board size as WIDTHxHEIGHT")
+    parser.add_argument("--mines", type=int, default=10)
+    parser.add_argument("--flag-ratio", type=float, default=0.1, help="share of moves that toggle a flag")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to measure")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between progress lines")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    args.width, args.height = (int(v) for v in args.board.lower().split("x"))
+
+    report = asyncio.run(run(args))
+    latency = report["latency_ms"]
+    print(f"{report['moves']} moves in {report['elapsed_s']:.1f} s, {report['moves_per_s']:.0f} moves/s, "
+          f"latency p50 {latency['p50']:.2f} ms p99 {latency['p99']:.2f} ms, "
+          f"{report['games_finished']} games finished, {report['errors']} errors")
+    if args.output:
+        with open(args.output, 'w') as wfp:
+            json.dump(report, wfp, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main_loadgen()
@@ -1,4 +1,11 @@
-import pygame, sys, math, random, json, os
+import pygame, sys, math, json, os, collections, itertools, threading, argparse, sqlite3
+from engine import Board, STATUS_LOST, STATUS_PLAYING, STATUS_WON
+from profiler import FrameProfiler
+from solver import Solver
+import savegame
+from replay import Recorder, ReplayWriter, REVEAL, FLAG, CHORD, apply_action, load as load_replay
+from stats import ResultsStore
+from noguess import BoardPool, MAX_CELLS as NO_GUESS_MAX_CELLS
 
 # COLORS
 COLOR_BG:tuple = (70, 70, 70)
@@ -18,11 +25,50 @@ BUTTON_HEIGHT:int = 55
 #border size = (544, 663)
 CELL_BORDER_X = 16
 CELL_BORDER_Y = 135
+BOARD_VIEW_WIDTH = 512
+BOARD_VIEW_HEIGHT = 512
+# counters and face panel above the board
+HUD_RECT = (16, 16, 512, 103)
+HUD_COUNTER_MARGIN = 35
+# counters grow past three digits instead of clamping, the timer stops here
+MAX_TIME_SECONDS = 99999
+
+# frame pacing: full speed while something moves or the player is busy, otherwise block on input
+INTERACTIVE_MS = 500    # keep the full frame rate this long after the last input
+PROFILER_WAKE_MS = 500  # the profiler overlay refreshes twice a second
+
+# camera zoom steps, in on-screen pixels per cell
+ZOOM_LEVELS = (8, 12, 16, 24, 32, 48)
+
+# (name, width, height, mines)
+BOARD_PRESETS = [("Beginner 9x9", 9, 9, 10),
+                 ("Intermediate 16x16", 16, 16, 40),
+                 ("Expert 30x16", 30, 16, 99),
+                 ("Large 100x100", 100, 100, 1600),
+                 ("Huge 1000x1000", 1000, 1000, 160000)]
+
+# sliced sprites of each style, baked to raw pixels on first use so later launches skip PNG decoding
+SPRITE_CACHE_DIR = "assets/cache"
+SPRITE_CACHE_MAGIC = b"PSC1"
+
+# finished games are recorded here, see replay.py
+REPLAY_DIR = "replays"
+# the game in progress is kept here between sessions, see savegame.py
+SAVE_FILE = "savegame.psv"
+# results of finished games, shown on the stats screen, see stats.py
+STATS_FILE = "stats.db"
+# seeds of boards checked to need no guessing, filled in the background, see noguess.py
+NO_GUESS_FILE = "noguess.json"
+
+# sprite index of a revealed safe cell, by its number of neighbouring bombs
+NUMBER_SPRITES = bytes([1] + [7+n for n in range(1, 9)])
 
 
 class SpriteSheet:
-    def __init__(self, filename):
-        self.sheet = pygame.image.load(filename).convert()
+    def __init__(self, filename, image=None):
+        if image is None:
+            image = pygame.image.load(filename)
+        self.sheet = image.convert()
 
 
     def image_at(self, rectangle, colorkey = None):
@@ -49,10 +95,243 @@ class SpriteSheet:
   
 
 
+class StyleAssets:
+    """Decoded sprite sheets and sliced per-style image tables, kept in bounded LRUs.
+
+    Sliced styles are also baked to ``cache_dir`` as raw BGRA pixels, one file
+    per style, and loaded back with ``pygame.image.frombuffer`` on later runs.
+    A baked file is rebuilt whenever one of its source sheets changes.
+    """
+    def __init__(self, sheet_capacity=24, style_capacity=8, cache_dir=None):
+        self.sheet_capacity = sheet_capacity
+        self.style_capacity = style_capacity
+        self.cache_dir = cache_dir or SPRITE_CACHE_DIR
+        self.sheets = collections.OrderedDict()
+        self.styles = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.warm_thread = None
+
+    @staticmethod
+    def sheet_files(style_settings) -> list:
+        style, number, face, border = style_settings
+        return [f"assets/tiles/tiles-{style}.png",
+                f"assets/numbers/numbers-{number}.png",
+                f"assets/faces/faces-{face}.png",
+                f"assets/borders/border-{border}.png",
+                f"assets/menus/menu-{border}.png",
+                f"assets/menus/button-{border}.png"]
+
+    def decode(self, filename) -> object:
+        """Return the decoded image of a sheet, reading it from disk only on a cache miss."""
+        with self.lock:
+            image = self.sheets.get(filename)
+            if image is not None:
+                self.sheets.move_to_end(filename)
+                return image
+
+        image = pygame.image.load(filename)
+        with self.lock:
+            self.sheets[filename] = image
+            while len(self.sheets) > self.sheet_capacity:
+                self.sheets.popitem(last=False)
+        return image
+
+    def baked_path(self, style_settings) -> str:
+        return os.path.join(self.cache_dir, "style-{}-{}-{}-{}.bin".format(*style_settings))
+
+    def source_signature(self, style_settings) -> list:
+        signature = []
+        for filename in self.sheet_files(style_settings):
+            stat = os.stat(filename)
+            signature.append([filename, stat.st_mtime_ns, stat.st_size])
+        return signature
+
+    def load_baked(self, style_settings) -> dict:
+        """Return the style's images from its baked file, or None when it is missing or stale."""
+        try:
+            with open(self.baked_path(style_settings), 'rb') as rfp:
+                data = rfp.read()
+            if data[:4] != SPRITE_CACHE_MAGIC:
+                return None
+            index_size = int.from_bytes(data[4:8], 'little')
+            index = json.loads(data[8:8+index_size])
+            if index['source'] != self.source_signature(style_settings):
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+
+        pixels = memoryview(data)[8+index_size:]
+        images = {}
+        for name, entries in index['images'].items():
+            surfaces = [pygame.image.frombuffer(pixels[offset:offset+w*h*4], (w, h), 'BGRA').convert()
+                        for offset, w, h in entries]
+            images[name] = surfaces if index['lists'][name] else surfaces[0]
+        return images
+
+    def bake(self, style_settings, images) -> None:
+        chunks = []
+        entries = {}
+        offset = 0
+        for name, value in images.items():
+            entries[name] = []
+            for surface in (value if isinstance(value, list) else [value]):
+                raw = pygame.image.tobytes(surface, 'BGRA')
+                entries[name].append([offset, surface.get_width(), surface.get_height()])
+                chunks.append(raw)
+                offset += len(raw)
+        index = json.dumps({'source': self.source_signature(style_settings), 'images': entries,
+                            'lists': {name: isinstance(value, list) for name, value in images.items()}}).encode()
+        path = self.baked_path(style_settings)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", 'wb') as wfp:
+                wfp.write(SPRITE_CACHE_MAGIC + len(index).to_bytes(4, 'little') + index)
+                wfp.writelines(chunks)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Sprite cache not written: {e}")
+
+    def style_images(self, style_settings) -> dict:
+        images = self.styles.get(style_settings)
+        if images is not None:
+            self.styles.move_to_end(style_settings)
+            return images
+
+        images = self.load_baked(style_settings)
+        if images is None:
+            images = self.slice_style(style_settings)
+            self.bake(style_settings, images)
+        self.styles[style_settings] = images
+        while len(self.styles) > self.style_capacity:
+            self.styles.popitem(last=False)
+        return images
+
+    def slice_style(self, style_settings) -> dict:
+        """Decode a style's sheets and cut them into the image tables the game uses."""
+        tiles, digits, faces, border, menu, button = [SpriteSheet(f, self.decode(f)) for f in self.sheet_files(style_settings)]
+        images = {
+            'menu': menu.image_at((0, 0, SCREEN_WIDTH, MENU_HEIGHT)),
+            'border': border.image_at(pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)),
+            'buttons': button.load_strip(pygame.Rect(0, 0, BUTTON_WIDTH, BUTTON_HEIGHT), 2),
+            'sprites': tiles.load_strip(pygame.Rect(0, 0, 16, 16), 8),
+            'numbers': tiles.load_strip(pygame.Rect(0, 16, 16, 16), 8),
+            'faces': faces.load_strip(pygame.Rect(0, 0, 24, 24), 5),
+            'digits': digits.load_strip(pygame.Rect(0, 0, 13, 23), 10),
+        }
+        return images
+
+    def warm(self, style_list) -> None:
+        """Decode the sheets of the given styles on a background thread, skipping styles already baked."""
+        filenames = []
+        for style_settings in style_list:
+            if os.path.isfile(self.baked_path(style_settings)):
+                continue
+            for filename in self.sheet_files(style_settings):
+                if filename not in filenames:
+                    filenames.append(filename)
+
+        def worker():
+            for filename in filenames:
+                self.decode(filename)
+
+        self.warm_thread = threading.Thread(target=worker, daemon=True)
+        self.warm_thread.start()
+
+
+
+class Camera:
+    """Scroll offset and zoom of the board inside its fixed on-screen viewport."""
+    def __init__(self, viewport, cell_size=SPRITE_SIZE):
+        self.viewport = pygame.Rect(viewport)
+        self.cell_size = cell_size
+        self.columns = 0
+        self.rows = 0
+        # board pixel shown at the top-left corner of the viewport
+        self.x = 0
+        self.y = 0
+
+    def fit(self, columns, rows) -> None:
+        """Frame a new board, using the largest zoom that shows all of it if there is one."""
+        self.columns = columns
+        self.rows = rows
+        self.cell_size = SPRITE_SIZE
+        for size in ZOOM_LEVELS:
+            if size <= SPRITE_SIZE and columns*size <= self.viewport.width and rows*size <= self.viewport.height:
+                self.cell_size = size
+        self.x = 0
+        self.y = 0
+        self.clamp()
+
+    def clamp(self) -> None:
+        board_w = self.columns*self.cell_size
+        board_h = self.rows*self.cell_size
+        # centre boards smaller than the viewport, keep larger ones inside their edges
+        if board_w <= self.viewport.width:
+            self.x = -(self.viewport.width-board_w)//2
+        else:
+            self.x = max(0, min(self.x, board_w-self.viewport.width))
+        if board_h <= self.viewport.height:
+            self.y = -(self.viewport.height-board_h)//2
+        else:
+            self.y = max(0, min(self.y, board_h-self.viewport.height))
+
+    def scroll(self, dx, dy) -> bool:
+        old = (self.x, self.y)
+        self.x += dx
+        self.y += dy
+        self.clamp()
+        return (self.x, self.y) != old
+
+    def zoom(self, steps, anchor=None) -> bool:
+        """Step through ZOOM_LEVELS, keeping the board point under anchor in place."""
+        index = ZOOM_LEVELS.index(self.cell_size) if self.cell_size in ZOOM_LEVELS else ZOOM_LEVELS.index(SPRITE_SIZE)
+        index = max(0, min(index+steps, len(ZOOM_LEVELS)-1))
+        new_size = ZOOM_LEVELS[index]
+        if new_size == self.cell_size:
+            return False
+
+        if anchor is None or not self.viewport.collidepoint(anchor):
+            anchor = self.viewport.center
+        ax = anchor[0] - self.viewport.x
+        ay = anchor[1] - self.viewport.y
+        self.x = (self.x+ax)*new_size//self.cell_size - ax
+        self.y = (self.y+ay)*new_size//self.cell_size - ay
+        self.cell_size = new_size
+        self.clamp()
+        return True
+
+    def screen_to_cell(self, pos) -> tuple:
+        """Map a window pixel position to board (column, row), or None outside the board."""
+        if not self.viewport.collidepoint(pos):
+            return None
+        x = (pos[0] - self.viewport.x + self.x) // self.cell_size
+        y = (pos[1] - self.viewport.y + self.y) // self.cell_size
+        if 0 <= x < self.columns and 0 <= y < self.rows:
+            return x, y
+        return None
+
+    def cell_to_screen(self, x, y) -> tuple:
+        return (self.viewport.x + x*self.cell_size - self.x, self.viewport.y + y*self.cell_size - self.y)
+
+    def center_on(self, x, y) -> None:
+        self.x = x*self.cell_size + self.cell_size//2 - self.viewport.width//2
+        self.y = y*self.cell_size + self.cell_size//2 - self.viewport.height//2
+        self.clamp()
+
+    def visible_cells(self) -> tuple:
+        """Return the (first_col, end_col, first_row, end_row) range of cells inside the viewport."""
+        x0 = max(0, self.x // self.cell_size)
+        y0 = max(0, self.y // self.cell_size)
+        x1 = min(self.columns, (self.x + self.viewport.width - 1) // self.cell_size + 1)
+        y1 = min(self.rows, (self.y + self.viewport.height - 1) // self.cell_size + 1)
+        return x0, x1, y0, y1
+
+
+
 class Timer:
     def __init__(self, autostart=False):
         self.start_time = 0
-        self.max_time_ms = 999*1000
+        self.max_time_ms = MAX_TIME_SECONDS*1000
         self.current_time = 0
         self.active = False
         if autostart:
@@ -67,7 +346,8 @@ class Timer:
     def activate(self):
         if not self.check_active():
             self.active = True
-            self.start_time = pygame.time.get_ticks()
+            # carries on from current_time, so a paused or resumed game keeps its time
+            self.start_time = pygame.time.get_ticks() - self.current_time
             print("Timer Activated.")
 
     def deactivate(self):
@@ -86,8 +366,30 @@ class Timer:
 
 
 
+class TextCache:
+    """Rendered text surfaces in a bounded LRU, keyed by (font, text, colour)."""
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = collections.OrderedDict()
+
+    def render(self, font, text, color) -> object:
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        while len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+
 class OptionBox():
-    def __init__(self, x, y, w, h, color, highlight_color, font, option_list, selected=0):
+    def __init__(self, x, y, w, h, color, highlight_color, font, option_list, selected=0, text_cache=None):
+        self.text_cache = text_cache if text_cache is not None else TextCache()
         self.color = color
         self.highlight_color = highlight_color
         self.rect = pygame.Rect(x, y, w, h)
@@ -102,7 +404,7 @@ class OptionBox():
     def draw(self, surf):
         pygame.draw.rect(surf, self.highlight_color if self.menu_active else self.color, self.rect)
         pygame.draw.rect(surf, (0, 0, 0), self.rect, 2)
-        msg = self.font.render(self.option_list[self.selected], 1, (0, 0, 0))
+        msg = self.text_cache.render(self.font, self.option_list[self.selected], (0, 0, 0))
         surf.blit(msg, msg.get_rect(center = self.rect.center))
 
         if self.draw_menu:
@@ -110,11 +412,19 @@ class OptionBox():
                 rect = self.rect.copy()
                 rect.y += (i+1) * self.rect.height
                 pygame.draw.rect(surf, self.highlight_color if i == self.active_option else self.color, rect)
-                msg = self.font.render(text, 1, (0, 0, 0))
+                msg = self.text_cache.render(self.font, text, (0, 0, 0))
                 surf.blit(msg, msg.get_rect(center = rect.center))
             outer_rect = (self.rect.x, self.rect.y + self.rect.height, self.rect.width, self.rect.height * len(self.option_list))
             pygame.draw.rect(surf, (0, 0, 0), outer_rect, 2)
 
+    def draw_state(self) -> tuple:
+        """Everything draw() depends on, to tell when the box needs drawing again."""
+        return (self.menu_active, self.selected, self.draw_menu, self.active_option)
+
+    def extent(self) -> object:
+        """Area covered by the box with its dropdown open."""
+        return self.rect.union(self.rect.move(0, self.rect.height*len(self.option_list)))
+
     def update(self):
         mpos = pygame.mouse.get_pos()
         self.menu_active = self.rect.collidepoint(mpos)
@@ -168,12 +478,16 @@ class Settings:
         return False
 
     def save_settings(self):
-        if self.checkfile():
-            with open(self.file, 'w') as wfp:
+        # written beside the old file and swapped in, so a missing file is created and a crash cannot truncate it
+        temp = self.file + ".tmp"
+        try:
+            with open(temp, 'w') as wfp:
                 wfp.write(json.dumps(self.data))
-            return True
-        else:
+            os.replace(temp, self.file)
+        except OSError as e:
+            print(f"Settings not saved: {e}")
             return False
+        return True
 
     def load_settings(self):
         data = {}
@@ -187,8 +501,34 @@ class Settings:
     def update(self):
         self.data = self.load_settings()
 
+    def get_board(self) -> tuple:
+        """Return the configured (width, height, mines), defaulting to the classic 16x16 board."""
+        width = max(1, int(self.data.get('width', 16)))
+        height = max(1, int(self.data.get('height', 16)))
+        mines = max(0, min(int(self.data.get('mines', BOMB_AMOUNT)), width*height-1))
+        return (width, height, mines)
+
+    def get_seed(self):
+        """Return the fixed board seed from the settings file, or None for a random board."""
+        seed = self.data.get('seed')
+        # replays store the seed as an unsigned varint and saves as 64 bits, anything else gets a random board
+        if isinstance(seed, int) and not isinstance(seed, bool) and 0 <= seed < 1 << 64:
+            return seed
+        return None
+
+    def set_board(self, width, height, mines):
+        self.data['width'] = width
+        self.data['height'] = height
+        self.data['mines'] = mines
+
     def get_style(self) -> tuple:
-        style = self.data[self.style_string]
+        ret_tup = self.style_tuple(self.data[self.style_string])
+        print(ret_tup
+              )
+        return ret_tup
+
+    @staticmethod
+    def style_tuple(style) -> tuple:
         number = 0
         face = 0
         border = 0
@@ -205,10 +545,7 @@ class Settings:
             face = 1
             border = 1
 
-        ret_tup = (style, number, face, border)
-        print(ret_tup
-              )
-        return ret_tup
+        return (style, number, face, border)
 
 
 class Cell:
@@ -258,219 +595,414 @@ class Cell:
 
 
 class MineField:
-    def __init__(self, field_width, field_height, bomb_limit, sprite_imgs):
+    def __init__(self, field_width, field_height, bomb_limit, sprite_imgs, camera, seed=None, replay_writer=None):
         self.width = field_width
         self.height = field_height
         self.bomb_limit = bomb_limit
         self.sn_imgs = sprite_imgs
-        self.first_click = False
-        self.cells = self.create_cell_2d_array()
-        self.bombs = self.create_random_bombs()
-        self.flags = []
-        #self.update()
+        self.camera = camera
+        # every game is recorded while a writer is set
+        self.replay_writer = replay_writer
+        self.recorder = None
+        self.reset_grid(seed)
+
+    @property
+    def bombs(self) -> list:
+        return self.board.mine_indices
+
+    @property
+    def flags(self) -> set:
+        return self.board.flags
 
     def get_flag_count(self):
         fl = len(self.flags)
         return self.bomb_limit-fl
 
-    def create_cell_2d_array(self) -> list:
-        cell_2d_array = [[Cell(self.sn_imgs[0], row, col) for row in range(self.width)] for col in range(self.height)]
-        return cell_2d_array
-
-    def create_random_bombs(self) -> list:
-        bomb_list = []
-        for i in range(self.bomb_limit):
-            finding = True
-            while finding:
-                rand_x = random.randrange(self.width)
-                rand_y = random.randrange(self.height)            
-                rand_cell = self.cells[rand_x][rand_y]
-                if rand_cell.is_bomb == False:
-                    finding = False
-
-            rand_cell.is_bomb = True
-            rand_cell.state = 'x'
-            bomb_list.append(rand_cell)
-
-        #print(len(bomb_list))
-        return bomb_list
-
-
     def reveal_bombs(self, endbomb, sprite_index=5):
-        if endbomb in self.bombs:
-            endbomb.is_revealed = True
-            endbomb.image = self.sn_imgs[6]
-            self.bombs.remove(endbomb)
-            #print(f"End-Game Bomb - (x:{endbomb.x}, y:{endbomb.y})")
-
-        for bomb_cell in self.bombs:
-            bomb_cell.is_revealed = True
-            if bomb_cell.is_flagged:
-                bomb_cell.image = self.sn_imgs[7]
+        board = self.board
+        if endbomb is not None:
+            board.revealed[endbomb] = 1
+            self.sprites[endbomb] = 6
+            self.dirty.add(endbomb)
+            #print(f"End-Game Bomb - {board.coords(endbomb)}")
+
+        for bomb in board.mine_indices:
+            if bomb == endbomb:
+                continue
+            board.revealed[bomb] = 1
+            if board.flagged[bomb]:
+                self.sprites[bomb] = 7
             else:
-                bomb_cell.image = self.sn_imgs[sprite_index]
+                self.sprites[bomb] = sprite_index
+            self.dirty.add(bomb)
 
-    def check_neighbor_states(self, row, col) -> None:
-        neighbor_bomb_count = 0
-        cell = self.cells[row][col]
-        if (cell.is_bomb or cell.is_flagged):
+    def cell_at(self, pos) -> int:
+        """Map a window pixel position to the index of the cell underneath it, or None."""
+        cell = self.camera.screen_to_cell(pos)
+        if cell is None:
+            return None
+        return self.board.index(cell[0], cell[1])
+
+    def handle_mouse_down(self, pos, button) -> None:
+        index = self.cell_at(pos)
+        if index is None:
             return
 
-        for x_offset in range(-1, 2):
-            for y_offset in range(-1, 2):
-                i = row + x_offset
-                j = col + y_offset
-                if (i > -1 and i < self.width and j > -1 and j < self.height):
-                    neighbor = self.cells[i][j]
-                    if (neighbor.is_bomb):
-                        neighbor_bomb_count += 1
-                    if (cell.is_revealed and not neighbor.is_bomb):
-                        if (cell.state == '0'):
-                            if neighbor.is_flagged:
-                                neighbor.is_flagged = False
-                            if neighbor in self.flags:
-                                self.flags.remove(neighbor)
-
-                            neighbor.is_revealed = True
-
-                if (neighbor_bomb_count > 0):
-                    cell.state = str(neighbor_bomb_count)
-
-
-    def handle_mouse(self, cell):
-        pos = pygame.mouse.get_pos()
-        LB_clicked, RB_clicked = cell.get_mouse(pos, cell.rect)
-        if (LB_clicked or RB_clicked) and not self.first_click:
+        board = self.board
+        if button == pygame.BUTTON_LEFT:
+            self.pressed_cell = index
+        elif button == pygame.BUTTON_RIGHT:
+            if board.revealed[index]:
+                return
             self.first_click = True
+            self.play(FLAG, index)
+        elif button == pygame.BUTTON_MIDDLE:
+            self.play(CHORD, index)
 
-        if LB_clicked:
-            cell.is_revealed = True
-        elif RB_clicked:
-            if cell.is_flagged == True:
-                cell.is_flagged = False
-            elif cell.is_flagged == False:
-                if len(self.flags) < BOMB_AMOUNT:
-                    cell.is_flagged = True
-
+    def handle_mouse_up(self, pos, button) -> None:
+        if button != pygame.BUTTON_LEFT:
+            return
 
+        # reveal only if the button is released over the cell it was pressed on
+        index = self.cell_at(pos)
+        pressed = self.pressed_cell
+        self.pressed_cell = None
+        if index is None or index != pressed:
+            return
 
-    def update_sprite(self, cell):
+        board = self.board
+        if not board.flagged[index]:
+            self.first_click = True
+            if not board.mines_placed:
+                print(f"Board seed: {board.seed}, first click: {board.coords(index)}")
+            self.play(REVEAL, index)
+
+    def play(self, kind, index) -> list:
+        """Make a move on the board, recording it when it changed anything."""
+        changed = apply_action(self.board, kind, index)
+        if changed:
+            self.clicks += 1
+            if self.recorder is not None:
+                self.recorder.record(kind, index)
+            self.apply(changed)
+        return changed
+
+    def apply(self, changed) -> None:
+        """Queue cells changed by the engine for redraw and feed them to the solver."""
+        self.dirty.update(changed)
+        if self.solver is not None:
+            self.solver.update(changed)
+
+    def open_start(self, index) -> None:
+        """Reveal the start cell of a no-guess board, the timer still waits for the player's first move."""
+        self.play(REVEAL, index)
+        self.clicks = 0
+
+    def get_solver(self) -> object:
+        """Return the board's solver, creating it on first use so it costs nothing until asked for."""
+        if self.solver is None:
+            self.solver = Solver(self.board)
+        return self.solver
+
+    def update_sprite(self, index):
+        board = self.board
         sprite_index = 0
-        if cell.is_revealed:
-            if cell.is_bomb:
+        if board.revealed[index]:
+            if board.mines[index]:
                 sprite_index = 6
             else:
-                if cell.state == '0':
-                    sprite_index = 1
-                else:
-                    sprite_index = 7+int(cell.state)
-        else:
-            if cell.is_flagged == True:
-                sprite_index = 2
-                if cell not in self.flags:
-                    self.flags.append(cell)
-
-            elif cell.is_flagged == False:
-                if cell in self.flags:
-                    self.flags.remove(cell)
-
-        cell.image = self.sn_imgs[sprite_index]
+                sprite_index = NUMBER_SPRITES[board.counts[index]]
+        elif board.flagged[index]:
+            sprite_index = 2
 
+        self.sprites[index] = sprite_index
 
     def update(self) -> None:
-        for row in range(self.width):
-            for col in range(self.height):
-                cell = self.cells[row][col]
-                
-                self.update_sprite(cell)
-                self.handle_mouse(cell)
-                self.check_neighbor_states(row, col)
- 
-    def reset_grid(self):
+        for index in self.dirty:
+            self.update_sprite(index)
+
+    def load_board(self, board) -> None:
+        """Continue a saved game on this field."""
+        self.width = board.width
+        self.height = board.height
+        self.bomb_limit = board.mine_count
+        self.board = board
+        self.solver = None
+        self.pressed_cell = None
+        self.first_click = True
+        self.clicks = 0
+        self.assisted = False
+        # the moves before the save are not in any replay, so the rest of the game is not recorded
+        self.stop_recording()
+        self.sprites = bytearray(board.size)
+        self.dirty = set()
+        # revealed | flagged as one big integer, to find the cells with a sprite without a Python loop per cell
+        shown = int.from_bytes(board.revealed, 'little') | int.from_bytes(board.flagged, 'little')
+        for index in itertools.compress(range(board.size), shown.to_bytes(board.size, 'little')):
+            self.update_sprite(index)
+
+    def stop_recording(self, status=None) -> None:
+        if self.recorder is not None:
+            self.recorder.close(status)
+            self.recorder = None
+
+    def reset_grid(self, seed=None):
         self.first_click = False
-        self.cells = self.create_cell_2d_array()
-        self.bombs = self.create_random_bombs()
-        self.flags = []
+        self.pressed_cell = None
+        self.board = Board(self.width, self.height, self.bomb_limit, seed)
+        self.solver = None
+        # moves that changed the board, and whether a hint or the solver helped, for the results store
+        self.clicks = 0
+        self.assisted = False
+        self.stop_recording()
+        if self.replay_writer is not None:
+            self.recorder = Recorder(self.board, REPLAY_DIR, self.replay_writer)
+        # sprite index into sn_imgs for every cell
+        self.sprites = bytearray(self.board.size)
+        # cells whose sprite changed since they were last drawn
+        self.dirty = set()
     
     
         
 class Game:
-    def __init__(self) -> None:
+    def __init__(self, warm_styles=True) -> None:
         self.title = 'Pysweeper!'
         self.debug = False
         self.running = False
         self.is_win = False
         self.is_lose = False
+        pygame.init()
         self.window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT)) # (544, 663)
         pygame.display.set_caption(self.title)
         self.clock = pygame.time.Clock()    
-        self.FPS:int = 20
-        pygame.init()
+        self.FPS:int = 60
+        # 'active' ticks at FPS, 'timer' wakes once a second for the clock, 'idle' sleeps until input
+        self.pacing_mode = 'active'
+        self.last_input = 0
+        self.woken_by = []
+        pygame.key.set_repeat(250, 40)
         self.face_scaled_sprite_size = (48, 48)
         self.face_x = 16+(512/2)-(self.face_scaled_sprite_size[0]/2)
         self.face_y = 16+(103/2)-(self.face_scaled_sprite_size[1]/2)
+        self.digit_scaled_sprite_size = (39, 69)
+        self.scaled_key = None
         self.pixel_sans_bold = pygame.font.Font("assets/fonts/PixeloidSans-Bold.ttf", 20)
         self.pixel_sans = pygame.font.Font("assets/fonts/PixeloidSans.ttf", 16)
         self.pixel_sans_small = pygame.font.Font("assets/fonts/PixeloidSans-Bold.ttf", 12)
+        self.text_cache = TextCache()
         self.settings = Settings("settings.json")
+        self.assets = StyleAssets()
+        self.camera = Camera((CELL_BORDER_X, CELL_BORDER_Y, BOARD_VIEW_WIDTH, BOARD_VIEW_HEIGHT))
+        self.grid = None
+        self.replay_writer = ReplayWriter()
+        try:
+            self.results = ResultsStore(STATS_FILE)
+        except sqlite3.Error as e:
+            print(f"Statistics disabled: {e}")
+            self.results = None
+        self.board_pool = BoardPool(NO_GUESS_FILE)
         self.load_styled_sprites()
         self.timer = Timer()
+        self.resume_game()
         self.menu_state = 'menu'
         self.face_status = 0
         self.face_clicked = False
-        self.digit_scaled_sprite_size = (39, 69)
+        # counters show at least this many digits
         self.digit_length = 3
-        self.digit_time_stack = ''
-        self.digit_flag_stack = ''
+        # the HUD is composed into one surface, rebuilt when its key (seconds, flags, face) changes
+        self.hud_surface = None
+        self.hud_key = None
+        # screen positions of the visible cells, kept until the camera moves
+        self.tile_positions_key = None
+        self.tile_positions_cache = None
+        # dirty-rectangle rendering, falls back to a full redraw when full_redraw is set
+        self.dirty_rendering = True
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.drawn_state = None
+        # solver helpers: H shows a hint, P toggles the probability heat-map, F5 auto-plays
+        self.hint_cell = None
+        self.show_probabilities = False
+        self.autoplaying = False
+        # replay being played back in the window, user input is ignored while it runs
+        self.replay = None
+        self.replay_started = 0
+        self.replay_next = 0
+        # per-phase frame timing, toggled with F3
+        self.profiler = FrameProfiler()
+        self.trace_path = None
+        self.profiler_surface = None
+        self.profiler_drawn_at = 0
         self.style_names = ["PMMine (Mine 2.0)", "WinMine 2.6-2.9", "Windows 95/98", "Windows 3.1/2000", "Windows 3.1/2000 Monochrome", "Prato Fiorito 2000", "Prato Fiorito XP", "Prato Fiorito Monochrome"]
-        self.style_optionbox = OptionBox(SCREEN_WIDTH/2-95, SCREEN_HEIGHT/2-121, 250, 25, (255, 255, 255), (210, 210, 205), self.pixel_sans_small, self.style_names)
+        # decode the other styles' sheets in the background, Game(warm_styles=False) skips it
+        self.warm_styles = warm_styles
+        if warm_styles:
+            self.assets.warm([Settings.style_tuple(s) for s in range(len(self.style_names)) if s != self.style_settings[0]])
+        self.style_optionbox = OptionBox(SCREEN_WIDTH/2-95, SCREEN_HEIGHT/2-121, 250, 25, (255, 255, 255), (210, 210, 205), self.pixel_sans_small, self.style_names, text_cache=self.text_cache)
+        self.board_presets = list(BOARD_PRESETS)
+        board = self.settings.get_board()
+        board_selected = [p[1:] for p in self.board_presets].index(board) if board in [p[1:] for p in self.board_presets] else -1
+        if board_selected < 0:
+            self.board_presets.append((f"Custom {board[0]}x{board[1]}", *board))
+            board_selected = len(self.board_presets)-1
+        self.board_optionbox = OptionBox(SCREEN_WIDTH/2-95, SCREEN_HEIGHT/2-81, 250, 25, (255, 255, 255), (210, 210, 205), self.pixel_sans_small, [p[0] for p in self.board_presets], board_selected, self.text_cache)
+        self.mode_optionbox = OptionBox(SCREEN_WIDTH/2-95, SCREEN_HEIGHT/2-41, 250, 25, (255, 255, 255), (210, 210, 205), self.pixel_sans_small, ["Random", "No guessing"], int(self.no_guess()), self.text_cache)
+        # menu screens are composed once per style by build_menu_layers, only buttons whose hover state changed are drawn
+        self.menu_buttons = []
+        for i, (caption, func) in enumerate([("PLAY", self.buttonpress_play), ("OPTIONS", self.buttonpress_options), ("STATS", self.buttonpress_stats), ("EXIT", self.buttonpress_exit)]):
+            button = Cell(self.button_imgs[0], SCREEN_WIDTH/2-100, SCREEN_HEIGHT/2-70+i*BUTTON_HEIGHT)
+            button.update_rect_components((BUTTON_WIDTH, BUTTON_HEIGHT))
+            self.menu_buttons.append((button, caption, func))
+        self.back_button = Cell(self.button_imgs[0], SCREEN_WIDTH/2+45, SCREEN_HEIGHT-250)
+        self.back_button.update_rect_components((BUTTON_WIDTH, BUTTON_HEIGHT))
+        # the stats tables reach further down than the options, so their back button sits lower
+        self.stats_back_button = Cell(self.button_imgs[0], SCREEN_WIDTH/2+45, SCREEN_HEIGHT-233)
+        self.stats_back_button.update_rect_components((BUTTON_WIDTH, BUTTON_HEIGHT))
+        self.drawn_buttons = {}
+        self.drawn_options = None
 
     def load_styled_sprites(self):
         style_settings = self.settings.get_style()
-        self.sprite_sheet = SpriteSheet(f"assets/tiles/tiles-{style_settings[0]}.png")
-        self.digits_sheet = SpriteSheet(f"assets/numbers/numbers-{style_settings[1]}.png")
-        self.face_sheet = SpriteSheet(f"assets/faces/faces-{style_settings[2]}.png")
-        self.border_sheet = SpriteSheet(f"assets/borders/border-{style_settings[3]}.png")
-        self.menu_sheet = SpriteSheet(f"assets/menus/menu-{style_settings[3]}.png")
-        self.menu_button_sheet = SpriteSheet(f"assets/menus/button-{style_settings[3]}.png")
-        self.menu_img = self.menu_sheet.image_at((0, 0, SCREEN_WIDTH, MENU_HEIGHT))
-        self.border_img = self.border_sheet.image_at(pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.button_imgs = self.menu_button_sheet.load_strip(pygame.Rect(0, 0, BUTTON_WIDTH, BUTTON_HEIGHT), 2)
-        self.sprite_imgs = self.sprite_sheet.load_strip(pygame.Rect(0, 0, 16, 16), 8)
-        self.number_imgs = self.sprite_sheet.load_strip(pygame.Rect(0, 16, 16, 16), 8)
-        self.face_sprites = self.face_sheet.load_strip(pygame.Rect(0, 0, 24, 24), 5)
-        self.digits_sprites = self.digits_sheet.load_strip(pygame.Rect(0, 0, 13, 23), 10)
+        self.style_settings = style_settings
+        # swapping image tables only, the game in progress and its timer are kept
+        images = self.assets.style_images(style_settings)
+        self.menu_img = images['menu']
+        # rebuilt from the new images the next time a menu screen is shown
+        self.menu_layers = None
+        self.border_img = images['border']
+        self.button_imgs = images['buttons']
+        self.sprite_imgs = images['sprites']
+        self.number_imgs = images['numbers']
+        self.face_sprites = images['faces']
+        self.digits_sprites = images['digits']
         self.face_cell = Cell(self.face_sprites[0], self.face_x, self.face_y)
-        self.grid = MineField(16, 16, BOMB_AMOUNT, self.sprite_imgs + self.number_imgs)
+        if self.grid is None:
+            self.new_board()
+        else:
+            self.grid.sn_imgs = self.sprite_imgs + self.number_imgs
+        self.scale_sprites()
+        self.full_redraw = True
+
+    def new_board(self) -> None:
+        """Build a fresh MineField with the configured dimensions and frame it in the camera."""
+        width, height, mines = self.settings.get_board()
+        self.camera.fit(width, height)
+        writer = self.replay_writer if self.settings.data.get('record_replays', True) else None
+        if self.grid is not None:
+            # an unfinished game keeps its replay, its recorder only writes at 64 KB or on close
+            self.grid.stop_recording()
+        self.grid = MineField(width, height, mines, self.sprite_imgs + self.number_imgs, self.camera, self.settings.get_seed(), writer)
+        if self.no_guess():
+            self.deal()
+        self.full_redraw = True
+
+    def no_guess(self) -> bool:
+        return bool(self.settings.data.get('no_guess', False))
+
+    def deal(self) -> None:
+        """Reset the field for a new game, with a board from the no-guess pool when that mode is on."""
+        grid = self.grid
+        if self.no_guess() and not self.board_pool.supports(grid.width, grid.height):
+            print(f"No-guess boards go up to {NO_GUESS_MAX_CELLS} cells, this one is random")
+        elif self.no_guess():
+            dealt = self.board_pool.take(grid.width, grid.height, grid.bomb_limit)
+            if dealt is not None:
+                seed, start = dealt
+                grid.reset_grid(seed)
+                grid.open_start(start)
+                self.camera.center_on(*grid.board.coords(start))
+                return
+            print("No no-guess board is ready yet, this one is random")
+        grid.reset_grid(self.settings.get_seed())
+
+    def save_game(self) -> None:
+        """Save the game in progress, or drop an old save once there is none to keep."""
+        if self.replay is not None:
+            return
+        board = self.grid.board
+        if board.mines_placed and board.status() == STATUS_PLAYING:
+            try:
+                savegame.save(board, SAVE_FILE, self.timer.update())
+                print(f"Game saved to {SAVE_FILE}")
+            except OSError as e:
+                print(f"Game not saved: {e}")
+        elif os.path.isfile(SAVE_FILE):
+            os.remove(SAVE_FILE)
+
+    def resume_game(self) -> None:
+        if not os.path.isfile(SAVE_FILE):
+            return
+        try:
+            board, elapsed_ms = savegame.load(SAVE_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Saved game not loaded: {e}")
+            return
+        self.camera.fit(board.width, board.height)
+        self.grid.load_board(board)
+        self.timer.current_time = elapsed_ms
+        self.full_redraw = True
+        print(f"Resumed a saved {board.width}x{board.height} game")
+
+    def play_replay(self, replay) -> None:
+        """Show a recorded game in real time on a fresh board."""
+        self.camera.fit(replay.width, replay.height)
+        if self.grid is not None:
+            self.grid.stop_recording()
+        self.grid = MineField(replay.width, replay.height, replay.mines, self.sprite_imgs + self.number_imgs, self.camera, replay.seed)
+        self.grid.board = replay.new_board()
+        self.replay = replay
+        self.replay_next = 0
+        self.replay_started = pygame.time.get_ticks()
+        self.autoplaying = False
+        self.menu_state = 'play'
+        self.full_redraw = True
+
+    def replay_step(self) -> None:
+        """Apply every replay action that is due by now."""
+        replay = self.replay
+        actions = replay.actions
+        elapsed = pygame.time.get_ticks() - self.replay_started
+        while self.replay_next < len(actions) and actions[self.replay_next][0] <= elapsed:
+            t, kind, index = actions[self.replay_next]
+            self.replay_next += 1
+            self.grid.first_click = True
+            self.grid.play(kind, index)
+
+    def scale_sprites(self) -> None:
+        """Scale the in-game sprites to their on-screen size once per style and cell size."""
+        key = (self.style_settings, self.camera.cell_size)
+        if self.scaled_key == key:
+            return
+
+        self.scaled_key = key
+        cell_size = (self.camera.cell_size, self.camera.cell_size)
+        # every cell sprite side by side in one surface, cells are drawn as areas of it
+        tiles = [pygame.transform.scale(img, cell_size) for img in self.sprite_imgs + self.number_imgs]
+        self.tile_atlas = pygame.Surface((cell_size[0]*len(tiles), cell_size[1])).convert()
+        self.tile_rects = [self.tile_atlas.blit(tile, (i*cell_size[0], 0)) for i, tile in enumerate(tiles)]
+        self.scaled_digit_imgs = [pygame.transform.scale(img, self.digit_scaled_sprite_size) for img in self.digits_sprites]
+        self.scaled_face_imgs = [pygame.transform.scale(img, self.face_scaled_sprite_size) for img in self.face_sprites]
+        self.hud_background = self.border_img.subsurface(HUD_RECT).copy()
+        # digit width -> digits scaled down to fit counters wider than three digits
+        self.narrow_digit_imgs = {}
+        self.hud_key = None
+        # probability heat-map tints, green (safe) to red (mine) in tenths
+        self.heat_imgs = []
+        for i in range(11):
+            tint = pygame.Surface(cell_size, pygame.SRCALPHA)
+            tint.fill((int(255*i/10), int(255*(10-i)/10), 0, 110))
+            self.heat_imgs.append(tint)
+        self.full_redraw = True
 
         
     def check_bombs(self):
-        flag_count = 0
-        for i in range(len(self.grid.bombs)):
-            cell = self.grid.bombs[i]
-            if (cell.is_revealed):
-                return -1, cell
-
-            if (cell.is_flagged):
-                flag_count += 1
-
-        if (self.grid.get_flag_count() == 0) and (flag_count >= BOMB_AMOUNT):
-            return 1, None
-
-        return 0, None
+        board = self.grid.board
+        status = board.status()
+        if status == STATUS_LOST:
+            return -1, board.exploded
 
+        return status, None
 
-    def create_digit_stack(self, src_number):
-        str_num = str(src_number)
-        chars_needed = self.digit_length-len(str_num)
-        _digits = ''
-
-        if chars_needed > 0:
-            for z in range(chars_needed):
-                _digits += '0'
-        _digits += str_num
-
-        return _digits
 
     def game_timer_update(self) -> int:
         is_active = self.timer.check_active()
@@ -486,44 +1018,7 @@ class Game:
 
 
     def update_game_board(self) -> None:
-        border_px_offset = 35
-        digit_flag_stack_pos = (32, 32)
-        time = math.floor(self.game_timer_update()/1000)
-        #print(time)
-        flags = self.grid.get_flag_count()
-        if flags < 0:
-            flags = 0
-
-        DTs = self.create_digit_stack(time)
-        DFs = self.create_digit_stack(flags)
-        #print(DFs)
-        if self.digit_time_stack != DTs:
-            self.digit_time_stack = DTs
-        if self.digit_flag_stack != DFs:
-            self.digit_flag_stack = DFs
-
-        #draw border
-        self.window.blit(self.border_img, (0, 0))
-
-        #draw time 
-        for ti in range(self.digit_length):
-            t_number = int(self.digit_time_stack[ti])
-            t_pos = (border_px_offset+16+(ti*self.digit_scaled_sprite_size[0]), 16+(103/2)-(self.digit_scaled_sprite_size[1]/2))
-            t_sprite = self.digits_sprites[t_number]
-            t_scaled_sprite = pygame.transform.scale(t_sprite, self.digit_scaled_sprite_size)
-            self.window.blit(t_scaled_sprite, t_pos)
-            if self.debug: pygame.draw.rect(self.window, (0, 0, 255), pygame.Rect(t_pos, self.digit_scaled_sprite_size), 1)
-
-        #draw flags remaining
-        for tf in range(self.digit_length):
-            f_number = int(self.digit_flag_stack[tf])
-            f_pos = (16+(512-(self.digit_scaled_sprite_size[0]*3))-border_px_offset+(tf*self.digit_scaled_sprite_size[0]), 16+(103/2)-(self.digit_scaled_sprite_size[1]/2))
-            f_sprite = self.digits_sprites[f_number]
-            f_scaled_sprite = pygame.transform.scale(f_sprite, self.digit_scaled_sprite_size)
-            self.window.blit(f_scaled_sprite, f_pos)
-            if self.debug: pygame.draw.rect(self.window, (0, 0, 255), pygame.Rect(f_pos, self.digit_scaled_sprite_size), 1)
-
-        #draw reset button
+        #handle reset button
         face_rect = self.face_cell.collide_box(self.face_scaled_sprite_size)
         LB_clicked, RB = self.face_cell.get_mouse(pygame.mouse.get_pos(), face_rect)
         if LB_clicked:
@@ -532,7 +1027,13 @@ class Game:
             self.menu_state = 'play'
             self.is_win = False
             self.is_lose = False
-            self.grid.reset_grid()
+            if self.replay is not None:
+                # leave the replay for a normal game
+                self.replay = None
+                self.new_board()
+            else:
+                self.deal()
+            self.full_redraw = True
             if self.timer.check_active():
                 self.timer.deactivate()
             self.timer.current_time = 0
@@ -544,62 +1045,265 @@ class Game:
                 self.face_status = 4
             else:
                 self.face_status = 0
-            
-        self.face_cell.image = self.face_sprites[self.face_status]
 
-        face_scaled_sprite = pygame.transform.scale(self.face_sprites[self.face_status], self.face_scaled_sprite_size)
-        self.window.blit(face_scaled_sprite, (self.face_cell.x, self.face_cell.y))
-        if self.debug: pygame.draw.rect(self.window, (255, 0, 0), face_rect, 1)
+        time = math.floor(self.game_timer_update()/1000)
+        flags = max(self.grid.get_flag_count(), 0)
+        #draw border
+        if self.full_redraw:
+            self.window.blit(self.border_img, (0, 0))
+
+        #draw time, flags remaining and reset button, composed only when one of them changes
+        key = (time, flags, self.grid.bomb_limit, self.face_status)
+        changed = self.hud_key != key
+        if changed:
+            self.hud_key = key
+            self.build_hud(time, flags, self.grid.bomb_limit)
+        if self.full_redraw or changed:
+            self.dirty_rects.append(self.window.blit(self.hud_surface, HUD_RECT[:2]))
+            if self.debug: pygame.draw.rect(self.window, (255, 0, 0), face_rect, 1)
+        self.face_cell.image = self.face_sprites[self.face_status]
 
+    def counter_digits(self, count) -> list:
+        """Digit images for a counter of count digits, narrowed so it fits beside the face."""
+        width, height = self.digit_scaled_sprite_size
+        room = (HUD_RECT[2] - self.face_scaled_sprite_size[0])//2 - HUD_COUNTER_MARGIN - 4
+        width = min(width, room//count)
+        if width == self.digit_scaled_sprite_size[0]:
+            return self.scaled_digit_imgs
+        if width not in self.narrow_digit_imgs:
+            size = (width, height*width//self.digit_scaled_sprite_size[0])
+            self.narrow_digit_imgs[width] = [pygame.transform.scale(img, size) for img in self.digits_sprites]
+        return self.narrow_digit_imgs[width]
+
+    def draw_counter(self, surface, value, count, x, right_align=False) -> None:
+        text = str(value).zfill(count)
+        digits = self.counter_digits(len(text))
+        width, height = digits[0].get_size()
+        if right_align:
+            x -= width*len(text)
+        y = (HUD_RECT[3] - height)//2
+        for i, char in enumerate(text):
+            surface.blit(digits[int(char)], (x + i*width, y))
+            if self.debug: pygame.draw.rect(surface, (0, 0, 255), pygame.Rect(x + i*width, y, width, height), 1)
+
+    def build_hud(self, time, flags, mines) -> None:
+        """Compose the counters and face onto the cached HUD background."""
+        surface = self.hud_background.copy()
+        # the flag counter is as wide as the mine count so it does not shift during a game
+        self.draw_counter(surface, time, self.digit_length, HUD_COUNTER_MARGIN)
+        self.draw_counter(surface, flags, max(self.digit_length, len(str(mines))), HUD_RECT[2] - HUD_COUNTER_MARGIN, True)
+        surface.blit(self.scaled_face_imgs[self.face_status], (self.face_x - HUD_RECT[0], self.face_y - HUD_RECT[1]))
+        self.hud_surface = surface
+
+
+    def tile_positions(self, x0, x1, y0, y1) -> list:
+        """Screen positions of the visible cells, row by row, rebuilt only when the camera moves."""
+        camera = self.camera
+        key = (x0, x1, y0, y1, camera.x, camera.y, camera.cell_size)
+        if self.tile_positions_key != key:
+            size = camera.cell_size
+            left, top = camera.cell_to_screen(0, 0)
+            xs = [left + x*size for x in range(x0, x1)]
+            self.tile_positions_cache = [[(sx, top + y*size) for sx in xs] for y in range(y0, y1)]
+            self.tile_positions_key = key
+        return self.tile_positions_cache
 
     def draw_cells(self) -> None:
-        for r in range(self.grid.width):
-            for c in range(self.grid.height):
-                cell = self.grid.cells[r][c]
-                scaled_sprite = pygame.transform.scale(cell.image, (SPRITE_SIZE, SPRITE_SIZE))
-                pos = (cell.x*SPRITE_SIZE+CELL_BORDER_X, cell.y*SPRITE_SIZE+CELL_BORDER_Y)
-                self.window.blit(scaled_sprite, pos)
-                if self.debug: pygame.draw.rect(self.window, (0, 255, 0), cell.collide_box_l(), 1)
+        """Draw the visible cells as areas of the tile atlas, all of them in one blits() call."""
+        self.scale_sprites()
+        grid = self.grid
+        camera = self.camera
+        window = self.window
+        board = grid.board
+        atlas = self.tile_atlas
+        tiles = self.tile_rects
+        sprites = grid.sprites
+        width = grid.width
+        heat = None
+        if self.show_probabilities:
+            # probabilities shift across the frontier with every move, so redraw the view
+            if grid.dirty:
+                self.full_redraw = True
+            solver = grid.get_solver()
+            probs, interior = solver.probabilities()
+            heat = self.heat_imgs
+        # only cells inside the viewport are ever drawn
+        x0, x1, y0, y1 = camera.visible_cells()
+        window.set_clip(camera.viewport)
+        if self.full_redraw:
+            window.fill(COLOR_BG, camera.viewport)
+            sequence = []
+            for y, positions in zip(range(y0, y1), self.tile_positions(x0, x1, y0, y1)):
+                row = y*width
+                sequence += zip(itertools.repeat(atlas), positions, map(tiles.__getitem__, sprites[row+x0:row+x1]))
+            window.blits(sequence, doreturn=False)
+            drawn = None
+        else:
+            drawn = []
+            for index in grid.dirty:
+                y, x = divmod(index, width)
+                if x0 <= x < x1 and y0 <= y < y1:
+                    drawn.append(index)
+            self.dirty_rects += window.blits([(atlas, camera.cell_to_screen(*board.coords(index)), tiles[sprites[index]])
+                                              for index in drawn])
+
+        # overlays go on top, only for the cells drawn this frame
+        size = camera.cell_size
+        if drawn is None and (heat is not None or self.debug):
+            drawn = [y*width + x for y in range(y0, y1) for x in range(x0, x1)]
+        if heat is not None:
+            for index in drawn:
+                if not board.revealed[index] and not board.flagged[index]:
+                    if index in solver.mines:
+                        p = 1.0
+                    elif index in solver.safe:
+                        p = 0.0
+                    else:
+                        p = probs.get(index, interior)
+                    window.blit(heat[round(p*10)], camera.cell_to_screen(*board.coords(index)))
+        hint = self.hint_cell
+        if hint is not None and (self.full_redraw or hint in grid.dirty):
+            x, y = board.coords(hint)
+            if x0 <= x < x1 and y0 <= y < y1:
+                pygame.draw.rect(window, (255, 255, 0), (camera.cell_to_screen(x, y), (size, size)), 2)
+        if self.debug:
+            for index in drawn:
+                pygame.draw.rect(window, (0, 255, 0), (camera.cell_to_screen(*board.coords(index)), (size, size)), 1)
+
+        window.set_clip(None)
+        grid.dirty.clear()
+
+    def present(self) -> None:
+        """Push this frame to the screen, only the dirty areas when possible."""
+        if self.full_redraw or not self.dirty_rendering:
+            pygame.display.flip()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+
+        self.dirty_rects = []
+        self.full_redraw = False
                 
     
-    def update_options(self):
+    def build_menu_layers(self) -> None:
+        """Compose the static parts of the menu and options screens, and every button state, once per style."""
+        text = self.text_cache
         x = SCREEN_WIDTH/2
         y = SCREEN_HEIGHT/2 - 201
-        self.window.fill(COLOR_BG)
-        self.window.blit(self.menu_img, (0, y))
-        
-        title = "OPTIONS & SETTINGS"
-        title_surface = self.pixel_sans_bold.render(title, True, (0, 0, 0))
-        self.window.blit(title_surface, (x-title_surface.get_width()/2, y+title_surface.get_height()))
-
-        style_opt = self.pixel_sans.render("Style Version:", True, (0, 0, 0))
+        base = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        base.fill(COLOR_BG)
+        base.blit(self.menu_img, (0, y))
+
+        menu = base.copy()
+        title_surface = text.render(self.pixel_sans_bold, "MINESWEEPER MAIN MENU", (0, 0, 0))
+        menu.blit(title_surface, (x-title_surface.get_width()/2, y+title_surface.get_height()))
+
+        options = base.copy()
+        title_surface = text.render(self.pixel_sans_bold, "OPTIONS & SETTINGS", (0, 0, 0))
+        options.blit(title_surface, (x-title_surface.get_width()/2, y+title_surface.get_height()))
+        style_opt = text.render(self.pixel_sans, "Style Version:", (0, 0, 0))
         pos = (x-220, y+style_opt.get_height()*4)
-        #print(pos)
-        self.window.blit(style_opt, pos)
-        
+        options.blit(style_opt, pos)
+        options.blit(text.render(self.pixel_sans, "Board Size:", (0, 0, 0)), (x-220, pos[1]+40))
+        options.blit(text.render(self.pixel_sans, "Mode:", (0, 0, 0)), (x-220, pos[1]+80))
+
+        # (caption, hovered) -> finished button, the caption drops 2px while hovered
+        buttons = {}
+        for caption in ["PLAY", "OPTIONS", "STATS", "EXIT", "Save & Exit", "Back"]:
+            for hovered in (False, True):
+                surface = self.button_imgs[hovered].copy()
+                elevation = 2 if hovered else 0
+                text_surface = text.render(self.pixel_sans_bold, caption, (0, 0, 0))
+                surface.blit(text_surface, text_surface.get_rect(center=surface.get_rect().center).move(elevation, elevation))
+                buttons[(caption, hovered)] = surface
+
+        stats = base.copy()
+        title_surface = text.render(self.pixel_sans_bold, "STATISTICS", (0, 0, 0))
+        stats.blit(title_surface, (x-title_surface.get_width()/2, y+title_surface.get_height()))
+
+        self.menu_layers = {'menu': menu, 'options': options, 'stats': stats, 'buttons': buttons}
+        self.menu_layers_key = self.style_settings
+
+    def draw_menu_layer(self, name) -> None:
+        if self.menu_layers is None or self.menu_layers_key != self.style_settings:
+            self.build_menu_layers()
+        self.window.blit(self.menu_layers[name], (0, 0))
+        self.drawn_buttons = {}
+
+    def poll_button(self, button) -> tuple:
+        """Return (clicked, hovered) for a menu button."""
+        cursor_pos = pygame.mouse.get_pos()
+        is_hovering = button.rect.collidepoint(cursor_pos)
+        LB_clicked, r = button.get_mouse(cursor_pos, button.rect)
+        return LB_clicked, bool(LB_clicked or is_hovering)
+
+    def update_button(self, button, caption) -> bool:
+        """Blit a menu button only when its hover state changed, returns True when it was clicked."""
+        LB_clicked, hovered = self.poll_button(button)
+        if self.drawn_buttons.get(caption) != hovered:
+            self.drawn_buttons[caption] = hovered
+            self.dirty_rects.append(self.window.blit(self.menu_layers['buttons'][(caption, hovered)], button.rect))
+        return LB_clicked
+
+    def consume_options_click(self) -> None:
+        """A dropdown option took this press, so the boxes and button under its row must not see it too."""
+        for box in (self.style_optionbox, self.board_optionbox, self.mode_optionbox):
+            box.mouse_handled = True
+        self.back_button.left_handled = True
+
+    def update_options(self):
         selected_option = self.style_optionbox.update()
         if selected_option >= 0:
+            self.consume_options_click()
             print(f"selected option: \"{self.style_names[selected_option]}\"")
             self.settings.data[self.settings.style_string] = selected_option
             self.load_styled_sprites()
-            
-        dimensions = (200, 55)
-        x = SCREEN_WIDTH/2+45
-        y = SCREEN_HEIGHT-250
-        back_but = Cell(self.button_imgs[0], x, y)
-        back_but.update_rect_components(dimensions)
-        is_hovering = back_but.rect.collidepoint(pygame.mouse.get_pos())
-        LB_clicked, r = back_but.get_mouse(pygame.mouse.get_pos(), back_but.rect)
-        elevation = 0
-        if (LB_clicked) or (is_hovering):
-            back_but.image = self.button_imgs[1]
-            elevation = 2
-
-        self.window.blit(back_but.image, (x, y))
-        text_surface = self.pixel_sans_bold.render("Save & Exit", True, (0, 0, 0))
-        self.window.blit(text_surface, text_surface.get_rect(center=back_but.rect.center).move(elevation, elevation))
-        self.style_optionbox.draw(self.window)
-        
+
+        # the style dropdown opens over the board box, so it takes the clicks while open
+        if not self.style_optionbox.draw_menu:
+            selected_board = self.board_optionbox.update()
+            if selected_board >= 0:
+                self.consume_options_click()
+                name, width, height, mines = self.board_presets[selected_board]
+                print(f"selected board: \"{name}\"")
+                self.settings.set_board(width, height, mines)
+                self.new_board()
+                if self.timer.check_active():
+                    self.timer.deactivate()
+                self.timer.current_time = 0
+
+        # likewise the board dropdown opens over the mode box
+        if not self.style_optionbox.draw_menu and not self.board_optionbox.draw_menu:
+            selected_mode = self.mode_optionbox.update()
+            if selected_mode >= 0:
+                self.consume_options_click()
+                width, height, mines = self.settings.get_board()
+                if selected_mode == 1 and not self.board_pool.supports(width, height):
+                    print(f"No-guess boards go up to {NO_GUESS_MAX_CELLS} cells, {width}x{height} stays random")
+                    self.mode_optionbox.selected = 0
+                    selected_mode = 0
+                self.settings.data['no_guess'] = selected_mode == 1
+                if self.no_guess():
+                    # boards are made in the background from now on, the game in progress is kept
+                    self.board_pool.fill(*self.settings.get_board())
+
+        if self.full_redraw:
+            self.draw_menu_layer('options')
+            self.drawn_options = None
+
+        # the dropdowns can open over the back button, so all four are restored and drawn together
+        LB_clicked, hovered = self.poll_button(self.back_button)
+        boxes = (self.mode_optionbox, self.board_optionbox, self.style_optionbox)
+        state = (hovered,) + tuple(box.draw_state() for box in boxes)
+        if state != self.drawn_options:
+            self.drawn_options = state
+            area = self.back_button.rect.unionall([box.extent() for box in boxes])
+            self.window.blit(self.menu_layers['options'], area, area)
+            self.window.blit(self.menu_layers['buttons'][("Save & Exit", hovered)], self.back_button.rect)
+            # bottom to top, so an open dropdown covers the boxes below it
+            for box in boxes:
+                box.draw(self.window)
+            self.dirty_rects.append(area)
+
         if (LB_clicked):      
             self.settings.save_settings()
             self.menu_state = 'menu'
@@ -612,74 +1316,284 @@ class Game:
         #print("OPTIONS")
         self.menu_state = 'options'
             
+    def buttonpress_stats(self):
+        self.menu_state = 'stats'
+
     def buttonpress_exit(self):
         #print("EXIT")
         self.running = False
     
+    def draw_stats(self) -> None:
+        """Query the results store and draw the best times for the current board and the win rate of every style."""
+        self.draw_menu_layer('stats')
+        font = self.pixel_sans_small
+        line = font.get_linesize()
+        x = SCREEN_WIDTH/2 - 220
+        y = SCREEN_HEIGHT/2 - 201 + 52
+        width, height, mines = self.settings.get_board()
+        board_name = self.board_presets[self.board_optionbox.selected][0]
+        if self.results is None:
+            self.window.blit(font.render("Statistics are not available.", True, (0, 0, 0)), (x, y))
+            return
+
+        games, wins = self.results.board_totals(width, height, mines)
+        self.window.blit(self.pixel_sans.render(f"Best times, {board_name}", True, (0, 0, 0)), (x, y))
+        summary = font.render(f"won {wins} of {games}", True, (0, 0, 0))
+        self.window.blit(summary, (x+440-summary.get_width(), y+4))
+        y += 22
+        best = self.results.best_times(width, height, mines)
+        if not best:
+            self.window.blit(font.render("No wins yet.", True, (0, 0, 0)), (x, y))
+        # two columns of five
+        for rank, (time_ms, played_at, clicks) in enumerate(best):
+            column, row = divmod(rank, 5)
+            entry = f"{rank+1:>2}. {time_ms/1000:.2f} s, {clicks} clicks"
+            self.window.blit(font.render(entry, True, (0, 0, 0)), (x + column*230, y + row*line))
+        y += 5*line + 4
+
+        self.window.blit(self.pixel_sans.render("Win rate by style", True, (0, 0, 0)), (x, y))
+        y += 22
+        rates = self.results.win_rate_by_style()
+        if not rates:
+            self.window.blit(font.render("No games yet.", True, (0, 0, 0)), (x, y))
+        for style, games, wins in rates:
+            name = self.style_names[style] if 0 <= style < len(self.style_names) else f"Style {style}"
+            self.window.blit(font.render(name, True, (0, 0, 0)), (x, y))
+            rate = font.render(f"{wins/games:.1%} of {games}", True, (0, 0, 0))
+            self.window.blit(rate, (x+250, y))
+            y += line
+
+    def update_stats(self) -> None:
+        if self.full_redraw:
+            self.draw_stats()
+        if self.update_button(self.stats_back_button, "Back"):
+            self.menu_state = 'menu'
+
+    def record_result(self, status) -> None:
+        """Queue a finished game for the results store, watched replays are not counted."""
+        if self.results is None or self.replay is not None:
+            return
+        grid = self.grid
+        board = grid.board
+        self.results.record(style=self.style_settings[0], width=board.width, height=board.height, mines=board.mine_count,
+                            seed=board.seed, time_ms=self.timer.update(), won=status == STATUS_WON, clicks=grid.clicks,
+                            assisted=grid.assisted)
+
     def update_menu(self):
-        x = SCREEN_WIDTH/2
-        y = SCREEN_HEIGHT/2 - 201
-        self.window.fill(COLOR_BG)
-        self.window.blit(self.menu_img, (0, y))
-        
-        title_surface = self.pixel_sans_bold.render("MINESWEEPER MAIN MENU", True, (0, 0, 0))
-        self.window.blit(title_surface, (x-title_surface.get_width()/2, y+title_surface.get_height()))
-        
-        text = ["PLAY", "OPTIONS", "EXIT"]
-        funcs = [self.buttonpress_play, self.buttonpress_options, self.buttonpress_exit]
-        button_cells = []
-        dimensions = (200, 55)
-        x = x - 100
-        y = SCREEN_HEIGHT/2 - 70
-        cursor_pos = pygame.mouse.get_pos()
-        for i in range(3):
-            elevation = 0
-            c = Cell(self.button_imgs[0], x, y)
-            c.update_rect_components(dimensions)
-            is_hovering = c.rect.collidepoint(cursor_pos)
-            LB_clicked, r = c.get_mouse(cursor_pos, c.rect)
-            if (LB_clicked) or (is_hovering):
-                c.image = self.button_imgs[1]
-                elevation = 2
-
-
-            self.window.blit(c.image, (x, y))
-            text_surface = self.pixel_sans_bold.render(text[i], True, (0, 0, 0))
-            self.window.blit(text_surface, text_surface.get_rect(center=c.rect.center).move(elevation, elevation))
-            button_cells.append(c)
-            y += dimensions[1]
-            
-            if (LB_clicked):
-                funcs[i]()
+        if self.full_redraw:
+            self.draw_menu_layer('menu')
+
+        for button, caption, func in self.menu_buttons:
+            if self.update_button(button, caption):
+                func()
+
+
+    def frame_mode(self) -> str:
+        """Pick how the loop should wait for the next frame."""
+        now = pygame.time.get_ticks()
+        replaying = self.replay is not None and self.replay_next < len(self.replay.actions)
+        if (self.autoplaying or replaying or self.full_redraw or self.menu_state != self.drawn_state
+                or any(pygame.mouse.get_pressed()) or now - self.last_input < INTERACTIVE_MS):
+            return 'active'
+        if self.timer.check_active():
+            return 'timer'
+        return 'idle'
+
+    def pace(self) -> None:
+        """Wait for the next frame: tick at FPS while active, else block on the event queue."""
+        mode = self.frame_mode()
+        if mode != self.pacing_mode:
+            self.pacing_mode = mode
+            if self.debug: print(f"Pacing: {mode}")
+        if mode == 'active':
+            self.clock.tick(self.FPS)
+            return
 
+        if mode == 'timer':
+            # wake just after the displayed second changes
+            timeout = 1001 - self.timer.update() % 1000
+        else:
+            timeout = 0
+        if self.profiler.enabled:
+            timeout = min(timeout or PROFILER_WAKE_MS, PROFILER_WAKE_MS)
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            self.woken_by.append(event)
+        self.clock.tick()
 
     def events(self) -> None:
-        for event in pygame.event.get():
+        pending = self.woken_by + pygame.event.get()
+        self.woken_by = []
+        if pending:
+            self.last_input = pygame.time.get_ticks()
+        for event in pending:
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE and self.menu_state == 'play':
+                if event.key == pygame.K_F3:
+                    self.toggle_profiler()
+                elif event.key in (pygame.K_h, pygame.K_p, pygame.K_F5) and self.menu_state == 'play' and self.replay is None:
+                    self.handle_solver_key(event.key)
+                elif event.key == pygame.K_ESCAPE and self.menu_state == 'stats':
+                    self.menu_state = 'menu'
+                elif event.key == pygame.K_ESCAPE and self.menu_state == 'play':
                     if self.timer.check_active():
+                        self.timer.update()
                         self.timer.deactivate()
+                    self.save_game()
                     self.menu_state = 'menu'
+                elif self.menu_state in ('play', 'over'):
+                    self.handle_camera_key(event.key)
+            elif event.type == pygame.MOUSEWHEEL and self.menu_state in ('play', 'over'):
+                if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                    moved = self.camera.zoom(event.y, pygame.mouse.get_pos())
+                else:
+                    step = self.camera.cell_size*3
+                    moved = self.camera.scroll(event.x*step, -event.y*step)
+                if moved:
+                    self.full_redraw = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and self.menu_state == 'play' and self.replay is None:
+                self.clear_hint()
+                self.grid.handle_mouse_down(event.pos, event.button)
+            elif event.type == pygame.MOUSEBUTTONUP and self.menu_state == 'play' and self.replay is None:
+                self.grid.handle_mouse_up(event.pos, event.button)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED):
+                self.full_redraw = True
+
+
+    def clear_hint(self) -> None:
+        if self.hint_cell is not None:
+            self.grid.dirty.add(self.hint_cell)
+            self.hint_cell = None
+
+    def handle_solver_key(self, key) -> None:
+        grid = self.grid
+        # games helped along by the solver are kept out of the best times
+        grid.assisted = True
+        if key == pygame.K_h:
+            self.clear_hint()
+            if not grid.board.mines_placed:
+                return
+            cell, p = grid.get_solver().hint()
+            if cell is None:
+                return
+            self.hint_cell = cell
+            grid.dirty.add(cell)
+            x, y = grid.board.coords(cell)
+            print(f"Hint: ({x}, {y}), mine chance {p:.0%}")
+            x0, x1, y0, y1 = self.camera.visible_cells()
+            if not (x0 <= x < x1 and y0 <= y < y1):
+                self.camera.center_on(x, y)
+                self.full_redraw = True
+        elif key == pygame.K_p:
+            self.show_probabilities = not self.show_probabilities
+            self.full_redraw = True
+        elif key == pygame.K_F5:
+            self.autoplaying = not self.autoplaying
+
+    def autoplay_step(self) -> None:
+        """Reveal every cell the solver knows is safe, or make its best guess if there are none."""
+        grid = self.grid
+        board = grid.board
+        self.clear_hint()
+        grid.first_click = True
+        if not board.mines_placed:
+            grid.play(REVEAL, board.index(board.width//2, board.height//2))
+            return
 
+        solver = grid.get_solver()
+        safe = solver.safe_moves()
+        if not safe:
+            cell, p = solver.hint()
+            safe = [cell] if cell is not None else []
+        for cell in safe:
+            if board.exploded is not None:
+                break
+            if board.flagged[cell]:
+                # the solver ignores player flags, take back a wrong one before revealing
+                grid.play(FLAG, cell)
+            grid.play(REVEAL, cell)
+        if not safe or board.exploded is not None:
+            self.autoplaying = False
+
+    def handle_camera_key(self, key) -> None:
+        """Scroll with the arrow keys or WASD, zoom with +/-."""
+        step = self.camera.cell_size
+        moves = {pygame.K_LEFT: (-step, 0), pygame.K_a: (-step, 0),
+                 pygame.K_RIGHT: (step, 0), pygame.K_d: (step, 0),
+                 pygame.K_UP: (0, -step), pygame.K_w: (0, -step),
+                 pygame.K_DOWN: (0, step), pygame.K_s: (0, step)}
+        moved = False
+        if key in moves:
+            moved = self.camera.scroll(*moves[key])
+        elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            moved = self.camera.zoom(1)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            moved = self.camera.zoom(-1)
+        if moved:
+            self.full_redraw = True
+
+    def toggle_profiler(self) -> None:
+        if self.profiler.enabled:
+            self.profiler.disable()
+        else:
+            self.profiler.enable(self.trace_path)
+        self.profiler_surface = None
+        self.full_redraw = True
+
+    def draw_profiler_overlay(self) -> None:
+        """Blit the profiler readout, re-rendering its text twice a second."""
+        now = pygame.time.get_ticks()
+        if self.profiler_surface is None or now - self.profiler_drawn_at >= 500:
+            self.profiler_drawn_at = now
+            lines = self.profiler.summary_lines(self.clock.get_fps()) + [f"pacing {self.pacing_mode}"]
+            line_height = self.pixel_sans_small.get_linesize()
+            surface = pygame.Surface((190, line_height*len(lines)+8))
+            for i, line in enumerate(lines):
+                surface.blit(self.pixel_sans_small.render(line, True, (0, 255, 0)), (4, 4+i*line_height))
+            if self.profiler_surface is not None and self.profiler_surface.get_size() != surface.get_size():
+                self.full_redraw = True
+            self.profiler_surface = surface
+
+        self.dirty_rects.append(self.window.blit(self.profiler_surface, (0, 0)))
 
     def start(self) -> None:
         self.running = True
         self.is_win = False
         self.is_lose = False
+        profiler = self.profiler
         while (self.running):
-            self.clock.tick(self.FPS)
+            self.pace()
+            profiler.begin_frame()
             self.events()
+            profiler.mark('events')
+            if self.menu_state != self.drawn_state or self.debug:
+                self.drawn_state = self.menu_state
+                self.full_redraw = True
             
             if self.menu_state == 'menu':
                 self.update_menu()
+                profiler.mark('menu')
 
             elif self.menu_state == 'play':
+                if self.replay is not None:
+                    self.replay_step()
+                    profiler.mark('replay')
+                if self.autoplaying:
+                    self.autoplay_step()
+                    profiler.mark('autoplay')
                 self.grid.update()
+                profiler.mark('update')
                 self.update_game_board()
+                profiler.mark('game_board')
                 self.draw_cells()
+                profiler.mark('draw')
                 win_check, endbomb = self.check_bombs()
+                profiler.mark('check')
+                if win_check != 0:
+                    self.record_result(win_check)
+                    self.grid.stop_recording(win_check)
+                    self.autoplaying = False
                 if win_check == 1:
                     self.is_win = True
                     self.is_lose = False
@@ -697,18 +1611,60 @@ class Game:
             
             elif self.menu_state == 'options':
                 self.update_options()
+                profiler.mark('options')
+
+            elif self.menu_state == 'stats':
+                self.update_stats()
+                profiler.mark('stats')
                 
             elif self.menu_state == 'over':
                 self.update_game_board()
+                profiler.mark('game_board')
                 self.draw_cells()
+                profiler.mark('draw')
             
-            pygame.display.flip()
+            if profiler.enabled:
+                self.draw_profiler_overlay()
+                profiler.mark('overlay')
+            self.present()
+            profiler.mark('present')
+            profiler.end_frame()
+
+        profiler.close()
+        self.save_game()
+        # an unfinished game is kept as an abandoned replay
+        self.grid.stop_recording()
+        self.replay_writer.close()
+        self.board_pool.close()
+        if self.results is not None:
+            self.results.close()
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["simulate"]:
+        # headless Monte Carlo win-rate run, see simulate.py
+        import simulate
+        simulate.main_simulate(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["serve"]:
+        # headless game server for many concurrent sessions, see server.py
+        import server
+        server.main_server(sys.argv[2:])
+        sys.exit()
+
+    parser = argparse.ArgumentParser(description="Pysweeper, a remake of Minesweeper 1990.")
+    parser.add_argument("--profile", action="store_true", help="start with the frame profiler overlay on (F3 toggles it)")
+    parser.add_argument("--trace", metavar="PATH", help="write profiler phases to a Chrome trace (.json) or JSON lines (.jsonl) file")
+    parser.add_argument("--replay", metavar="PATH", help="watch a recorded game (.psr) in real time")
+    args = parser.parse_args()
+
     game = Game()
     game.debug = False
+    game.trace_path = args.trace
+    if args.profile or args.trace:
+        game.toggle_profiler()
+    if args.replay:
+        game.play_replay(load_replay(args.replay))
     game.start()
     pygame.quit()
-    
-sys.exit()
\ No newline at end of file
+    sys.exit()
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""Boards that never need a guess, made ahead of time by worker processes.
+
+A board is "no-guess" when the solver's deterministic rules (the propagation
+rules, then exact enumeration of the frontier) clear it from the first click
+without ever meeting a cell it cannot prove safe. The layout depends on the
+seed and on the first click, so a pool entry is ``(seed, start cell)`` and
+the game opens the start cell itself.
+
+Checking takes milliseconds on expert boards and most layouts fail, so
+``BoardPool`` keeps up to ``capacity`` boards per configuration, filled by
+low-priority worker processes. Taking one is a list pop, so the face reset
+stays instant, and every board found is saved to a small JSON file so the
+pool survives restarts. Only the configuration being played is searched:
+selecting another one, or giving one up after ``MAX_ATTEMPTS`` misses in a
+row, bumps a generation number shared with the workers, and they drop every
+task queued before it. Boards above ``MAX_CELLS`` are never searched::
+
+    pool = BoardPool("noguess.json")
+    pool.fill(30, 16, 99)
+    pool.take(30, 16, 99)   # (seed, start cell), or None while the pool is empty
+"""
+import json, multiprocessing, os, random, signal, threading
+
+from engine import Board
+from solver import Solver
+
+
+# layouts a worker task tries before reporting back
+TASK_ATTEMPTS = 100
+# layouts tried for one configuration since its last find before it is given up as too dense
+MAX_ATTEMPTS = 2000
+# one check takes ~125 ms at 100x100 and ~15 s at 1000x1000, larger boards are always random
+MAX_CELLS = 10000
+
+
+def start_cell(width, height) -> int:
+    return (height//2)*width + width//2
+
+
+def is_solvable(width, height, mines, seed, first, safe_radius=1) -> bool:
+    """True when the solver clears the board from first without guessing."""
+    board = Board(width, height, mines, seed, safe_radius)
+    board.reveal_index(first)
+    solver = Solver(board)
+    while board.safe_left:
+        safe = solver.safe_moves()
+        if not safe:
+            # probabilities() also weighs in the mine count, which settles some endgames
+            solver.probabilities()
+            safe = solver.safe_moves()
+            if not safe:
+                return False
+        for cell in safe:
+            solver.update(board.reveal_index(cell))
+    return True
+
+
+def find_board(config, generation, current) -> tuple:
+    """Return (config, generation, seed, attempts), seed is None if none was found.
+
+    Stops early once current (shared with the pool) has moved past generation.
+    """
+    width, height, mines, safe_radius = config
+    rng = random.Random()
+    first = start_cell(width, height)
+    for attempt in range(1, TASK_ATTEMPTS+1):
+        if current.value != generation:
+            return config, generation, None, attempt-1
+        seed = rng.getrandbits(32)
+        if is_solvable(width, height, mines, seed, first, safe_radius):
+            return config, generation, seed, attempt
+    return config, generation, None, TASK_ATTEMPTS
+
+
+def worker_loop(tasks, results, current) -> None:
+    """Worker process: find a board for every (config, generation) queued, until None arrives."""
+    # Ctrl+C reaches the whole process group, the game shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # the game keeps the foreground, workers only use idle time
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    for config, generation in iter(tasks.get, None):
+        # tasks from before the last generation bump are dropped unrun
+        if current.value == generation:
+            results.put(find_board(config, generation, current))
+
+
+class BoardPool:
+    def __init__(self, path, capacity=16, workers=None):
+        self.path = path
+        self.capacity = capacity
+        self.workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        # (width, height, mines, safe_radius) -> seeds of checked boards
+        self.boards = self.load()
+        self.pending = {}
+        # layouts checked since the last board found, per configuration
+        self.misses = {}
+        self.failed = set()
+        self.processes = []
+        self.tasks = None
+        # the configuration being searched, and the generation its tasks belong to
+        self.selected = None
+        self.generation = 0
+        self.current = None
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, 'r') as rfp:
+                data = json.load(rfp)
+            return {tuple(int(v) for v in key.split(",")): [int(seed) for seed in seeds] for key, seeds in data.items()}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        with self.lock:
+            data = {",".join(map(str, key)): list(seeds) for key, seeds in self.boards.items() if seeds}
+        temp = self.path + ".tmp"
+        with self.save_lock:
+            try:
+                with open(temp, 'w') as wfp:
+                    json.dump(data, wfp)
+                os.replace(temp, self.path)
+            except OSError as e:
+                print(f"No-guess boards not saved: {e}")
+
+    def supports(self, width, height) -> bool:
+        return width*height <= MAX_CELLS
+
+    def count(self, width, height, mines, safe_radius=1) -> int:
+        return len(self.boards.get((width, height, mines, safe_radius), ()))
+
+    def take(self, width, height, mines, safe_radius=1) -> tuple:
+        """Return (seed, start cell) of a checked board and start replacing it, or None if none is ready."""
+        config = (width, height, mines, safe_radius)
+        with self.lock:
+            seeds = self.boards.get(config)
+            seed = seeds.pop() if seeds else None
+        self.fill(width, height, mines, safe_radius)
+        if seed is None:
+            return None
+        return seed, start_cell(width, height)
+
+    def fill(self, width, height, mines, safe_radius=1) -> None:
+        """Queue enough worker tasks to bring this configuration's pool up to capacity."""
+        config = (width, height, mines, safe_radius)
+        if config in self.failed or not self.supports(width, height):
+            return
+        if self.tasks is None:
+            self.start_workers()
+        with self.lock:
+            if config != self.selected:
+                # only the configuration in play is searched, whatever is queued for the last one is dropped
+                self.selected = config
+                self.next_generation()
+            wanted = self.capacity - len(self.boards.get(config, ())) - self.pending.get(config, 0)
+            if wanted <= 0:
+                return
+            self.pending[config] = self.pending.get(config, 0) + wanted
+            generation = self.generation
+        for _ in range(wanted):
+            self.tasks.put((config, generation))
+
+    def next_generation(self) -> None:
+        """Called with the lock held: make the workers drop every task queued so far."""
+        self.generation += 1
+        self.current.value = self.generation
+        self.pending.clear()
+
+    def start_workers(self) -> None:
+        # spawned, not forked, the game process has threads of its own running. Plain processes on
+        # SimpleQueues rather than a Pool, whose terminate() can hang on a lock held by a killed worker
+        context = multiprocessing.get_context("spawn")
+        self.tasks = context.SimpleQueue()
+        results = context.SimpleQueue()
+        self.current = context.RawValue('i', self.generation)
+        for _ in range(self.workers):
+            process = context.Process(target=worker_loop, args=(self.tasks, results, self.current), daemon=True)
+            process.start()
+            self.processes.append(process)
+        threading.Thread(target=self.collect, args=(results,), daemon=True).start()
+
+    def collect(self, results) -> None:
+        for result in iter(results.get, None):
+            self.found(result)
+
+    def found(self, result) -> None:
+        """Runs on the collecting thread."""
+        config, generation, seed, attempts = result
+        with self.lock:
+            if seed is not None:
+                # a board found for an older generation is still a checked board
+                self.boards.setdefault(config, []).append(seed)
+                self.misses[config] = 0
+            stale = generation != self.generation
+            if not stale:
+                self.pending[config] = self.pending.get(config, 1) - 1
+                if seed is None:
+                    misses = self.misses[config] = self.misses.get(config, 0) + attempts
+                    if misses >= MAX_ATTEMPTS:
+                        self.failed.add(config)
+                        self.selected = None
+                        self.next_generation()
+                        print(f"No no-guess board found for {config[0]}x{config[1]} with {config[2]} mines in {misses} tries")
+                        return
+        if seed is not None:
+            self.save()
+        elif not stale:
+            # the task came back empty handed, queue another in its place
+            self.fill(*config)
+
+    def close(self) -> None:
+        """Stop the workers, boards still being searched for are dropped."""
+        for process in self.processes:
+            process.kill()
+        for process in self.processes:
+            process.join(1)
+        self.processes = []
+        self.tasks = None
+        self.pending.clear()
+        self.save()
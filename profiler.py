@@ -0,0 +1,131 @@
+"""Per-phase frame timing for the game loop.
+
+``FrameProfiler.mark(name)`` closes the phase that started at the previous mark.
+Every phase feeds a ``RollingHistogram`` so the overlay can show p50/p99 without
+sorting, and finished phases can be streamed to a Chrome trace (``.json``, open
+in chrome://tracing or Perfetto) or to JSON lines (``.jsonl``).
+
+While disabled every call returns straight away, so the loop can leave the
+marks in place.
+"""
+import bisect, collections, json, time
+
+
+# log-spaced bin upper edges in milliseconds, 0.01 ms up to roughly 6 s
+HISTOGRAM_EDGES = [0.01 * 1.25**i for i in range(60)]
+
+
+class RollingHistogram:
+    """Histogram of the last `window` samples, updated in O(1) per sample."""
+    def __init__(self, window=240):
+        self.counts = [0] * (len(HISTOGRAM_EDGES)+1)
+        self.samples = collections.deque(maxlen=window)
+        self.total = 0.0
+
+    def add(self, value) -> None:
+        if len(self.samples) == self.samples.maxlen:
+            old_bin, old_value = self.samples[0]
+            self.counts[old_bin] -= 1
+            self.total -= old_value
+        b = bisect.bisect_left(HISTOGRAM_EDGES, value)
+        self.samples.append((b, value))
+        self.counts[b] += 1
+        self.total += value
+
+    def mean(self) -> float:
+        return self.total / len(self.samples) if self.samples else 0.0
+
+    def percentile(self, p) -> float:
+        """Upper edge of the bin holding the p-th percentile sample."""
+        if not self.samples:
+            return 0.0
+        rank = p/100 * len(self.samples)
+        seen = 0
+        for b, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return HISTOGRAM_EDGES[b] if b < len(HISTOGRAM_EDGES) else HISTOGRAM_EDGES[-1]
+        return HISTOGRAM_EDGES[-1]
+
+
+class FrameProfiler:
+    def __init__(self, window=240):
+        self.enabled = False
+        self.window = window
+        self.frame = RollingHistogram(window)
+        self.phases = {}
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.frame_count = 0
+        self.trace_file = None
+        self.trace_jsonl = False
+        self.trace_events = []
+
+    def enable(self, trace_path=None) -> None:
+        self.enabled = True
+        # usually switched on partway through a frame, after begin_frame() returned early, so
+        # the rest of that frame is timed from here rather than from a stale or zero start
+        self.frame_start = self.last = time.perf_counter()
+        if trace_path and self.trace_file is None:
+            self.trace_jsonl = trace_path.endswith(".jsonl")
+            self.trace_file = open(trace_path, 'w')
+            if not self.trace_jsonl:
+                self.trace_file.write("[\n")
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, name) -> None:
+        """Close the phase running since the previous mark and record it under name."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = RollingHistogram(self.window)
+        phase.add((now - self.last)*1000)
+        if self.trace_file is not None:
+            self.trace_events.append((name, self.last, now - self.last))
+        self.last = now
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame.add((now - self.frame_start)*1000)
+        self.frame_count += 1
+        if self.trace_file is not None:
+            self.trace_events.append(("frame", self.frame_start, now - self.frame_start))
+            self.flush_trace()
+
+    def flush_trace(self) -> None:
+        lines = []
+        for name, start, duration in self.trace_events:
+            event = {"name": name, "ph": "X", "ts": round(start*1e6, 1), "dur": round(duration*1e6, 1),
+                     "pid": 1, "tid": 1, "args": {"frame": self.frame_count}}
+            lines.append(json.dumps(event) + ("\n" if self.trace_jsonl else ",\n"))
+        self.trace_file.write("".join(lines))
+        self.trace_events.clear()
+
+    def close(self) -> None:
+        if self.trace_file is None:
+            return
+        self.flush_trace()
+        if not self.trace_jsonl:
+            # closing metadata event so the array stays valid JSON without a trailing comma
+            self.trace_file.write(json.dumps({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "pysweeper"}}) + "\n]\n")
+        self.trace_file.close()
+        self.trace_file = None
+
+    def summary_lines(self, fps) -> list:
+        lines = [f"FPS {fps:5.1f}",
+                 f"frame p50 {self.frame.percentile(50):6.2f} ms",
+                 f"frame p99 {self.frame.percentile(99):6.2f} ms"]
+        for name, phase in self.phases.items():
+            lines.append(f"{name:<10} {phase.mean():6.2f} ms")
+        return lines
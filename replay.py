@@ -0,0 +1,229 @@
+"""Compact binary game replays.
+
+A replay is the board header followed by every action that changed the board,
+all as unsigned LEB128 varints::
+
+    b"PSR1" width height mines safe_radius seed
+    (delta_ms  index<<2 | kind)*
+
+``kind`` is ``REVEAL``, ``FLAG`` or ``CHORD``, and ``delta_ms`` is the time
+since the previous action. A finished game ends with an ``END`` action whose
+index is the final status + 1. The seed and the first reveal fix the mine
+layout, so replaying the actions through ``engine.Board`` rebuilds the game
+exactly. Actions are about three bytes each, so an expert game comes to a few
+hundred bytes.
+
+``Recorder`` appends to an in-memory buffer and hands full buffers to a
+``ReplayWriter`` thread, so recording never waits on the disk.
+"""
+import os, queue, threading, time
+
+from engine import Board, STATUS_PLAYING
+
+
+MAGIC = b"PSR1"
+
+REVEAL = 0
+FLAG = 1
+CHORD = 2
+END = 3
+
+# a recorder passes its buffer to the writer thread once it holds this many bytes
+FLUSH_SIZE = 64*1024
+
+
+def write_varint(buffer, value) -> None:
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, pos) -> tuple:
+    """Return (value, position after it)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class ReplayWriter:
+    """Background thread appending finished chunks to replay files."""
+    def __init__(self):
+        self.jobs = queue.SimpleQueue()
+        self.thread = None
+
+    def submit(self, path, data) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.worker, daemon=True)
+            self.thread.start()
+        self.jobs.put((path, data))
+
+    def worker(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            path, data = job
+            try:
+                with open(path, 'ab') as wfp:
+                    wfp.write(data)
+            except OSError as e:
+                print(f"Replay not saved: {e}")
+
+    def close(self) -> None:
+        """Wait for queued writes to reach the disk."""
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+class Recorder:
+    """Records one game. Nothing is written until the first action."""
+    def __init__(self, board, directory, writer):
+        self.board = board
+        self.directory = directory
+        self.writer = writer
+        self.path = None
+        self.buffer = bytearray()
+        self.start = 0.0
+        self.last = 0
+        self.closed = False
+
+    def record(self, kind, index) -> None:
+        if self.closed:
+            return
+        if self.path is None:
+            self.begin()
+        # milliseconds since the first action, deltas of these do not drift with rounding
+        now = int((time.monotonic() - self.start)*1000)
+        buffer = self.buffer
+        write_varint(buffer, now - self.last)
+        write_varint(buffer, index << 2 | kind)
+        self.last = now
+        if len(buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def begin(self) -> None:
+        board = self.board
+        self.start = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"{stamp}-{board.width}x{board.height}-{board.seed}.psr")
+        n = 1
+        while os.path.exists(self.path):
+            n += 1
+            self.path = os.path.join(self.directory, f"{stamp}-{board.width}x{board.height}-{board.seed}-{n}.psr")
+        self.buffer += MAGIC
+        for value in (board.width, board.height, board.mine_count, board.safe_radius, board.seed):
+            write_varint(self.buffer, value)
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.writer.submit(self.path, bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self, status=None) -> None:
+        """Finish the replay, with an END action when the game reached a result."""
+        if self.closed:
+            return
+        if self.path is not None:
+            if status is not None and status != STATUS_PLAYING:
+                self.record(END, status+1)
+            self.flush()
+        self.closed = True
+
+
+class Replay:
+    def __init__(self, width, height, mines, safe_radius, seed, actions, status=None):
+        self.width = width
+        self.height = height
+        self.mines = mines
+        self.safe_radius = safe_radius
+        self.seed = seed
+        # (milliseconds since the first action, kind, cell index)
+        self.actions = actions
+        # recorded final status, None for an abandoned game
+        self.status = status
+
+    def new_board(self) -> Board:
+        return Board(self.width, self.height, self.mines, self.seed, self.safe_radius)
+
+
+def decode(data) -> Replay:
+    if data[:4] != MAGIC:
+        raise ValueError("not a replay file")
+    pos = 4
+    header = []
+    actions = []
+    status = None
+    t = 0
+    end = len(data)
+    try:
+        for _ in range(5):
+            value, pos = read_varint(data, pos)
+            header.append(value)
+        while pos < end:
+            delta, pos = read_varint(data, pos)
+            action, pos = read_varint(data, pos)
+            t += delta
+            kind = action & 3
+            if kind == END:
+                status = (action >> 2) - 1
+                break
+            actions.append((t, kind, action >> 2))
+    except IndexError:
+        raise ValueError("truncated replay") from None
+    return Replay(*header, actions, status)
+
+
+def load(path) -> Replay:
+    with open(path, 'rb') as rfp:
+        return decode(rfp.read())
+
+
+def apply_action(board, kind, index) -> list:
+    if kind == REVEAL:
+        return board.reveal_index(index)
+    if kind == FLAG:
+        return board.toggle_flag_index(index)
+    return board.chord_index(index)
+
+
+def verify(replay) -> bool:
+    """Replay every action headless at full speed and check the game ends as recorded."""
+    board = replay.new_board()
+    size = board.size
+    for t, kind, index in replay.actions:
+        if index >= size:
+            return False
+        apply_action(board, kind, index)
+    if replay.status is None:
+        return True
+    return board.status() == replay.status
+
+
+if __name__ == "__main__":
+    import sys
+    paths = sys.argv[1:]
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        paths = [os.path.join(paths[0], f) for f in sorted(os.listdir(paths[0])) if f.endswith(".psr")]
+    start = time.perf_counter()
+    failed = []
+    for path in paths:
+        try:
+            if not verify(load(path)):
+                failed.append(path)
+        except ValueError:
+            failed.append(path)
+    elapsed = time.perf_counter() - start
+    for path in failed:
+        print(f"FAILED {path}")
+    print(f"{len(paths)-len(failed)}/{len(paths)} replays valid in {elapsed:.3f} s")
+    sys.exit(1 if failed else 0)
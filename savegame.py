@@ -0,0 +1,91 @@
+"""Bit-packed save files for games in progress.
+
+Layout, little-endian::
+
+    header     64 bytes, see HEADER (magic, size, mines, seed, first click, timer)
+    mines      ceil(cells/8) bytes, one bit per cell, cell i is bit i%8 of byte i//8
+    revealed   same
+    flagged    same
+
+A million-cell board is 375 KB. Loading maps the file and unpacks the three
+planes straight from the mapping into the board's byte columns (with NumPy
+when it is available), so no per-cell Python objects are created and the file
+is never read into an intermediate buffer.
+"""
+import itertools, mmap, os, struct
+
+from engine import Board, numpy
+
+
+MAGIC = b"PSV1"
+
+# magic, width, height, mines, safe_radius, safe_index (-1 for none), seed, elapsed ms
+HEADER = struct.Struct("<4sIIIBxxxqQQ")
+HEADER_SIZE = 64
+
+# byte -> its 8 bits as 0/1 bytes, least significant bit first
+_UNPACK = [bytes((b >> bit) & 1 for bit in range(8)) for b in range(256)]
+_PACK = {bits: b for b, bits in enumerate(_UNPACK)}
+
+
+def pack_bits(plane) -> bytes:
+    if numpy is not None:
+        return numpy.packbits(numpy.frombuffer(plane, dtype=numpy.uint8), bitorder='little').tobytes()
+    tail = len(plane) % 8
+    plane = bytes(plane) + bytes(8-tail if tail else 0)
+    return bytes(_PACK[plane[i:i+8]] for i in range(0, len(plane), 8))
+
+
+def unpack_bits(data, offset, count) -> bytes:
+    """Unpack count bits of data starting at byte offset into one 0/1 byte each."""
+    length = (count+7)//8
+    if numpy is not None:
+        bits = numpy.frombuffer(data, dtype=numpy.uint8, count=length, offset=offset)
+        return numpy.unpackbits(bits, count=count, bitorder='little').tobytes()
+    return b''.join(map(_UNPACK.__getitem__, data[offset:offset+length]))[:count]
+
+
+def set_indices(plane) -> list:
+    if numpy is not None:
+        return numpy.flatnonzero(numpy.frombuffer(plane, dtype=numpy.uint8)).tolist()
+    return list(itertools.compress(range(len(plane)), plane))
+
+
+def save(board, path, elapsed_ms=0) -> None:
+    """Write an in-progress board to path, atomically replacing any older save."""
+    safe_index = -1 if board.safe_index is None else board.safe_index
+    header = HEADER.pack(MAGIC, board.width, board.height, board.mine_count, board.safe_radius,
+                         safe_index, board.seed & 0xffffffffffffffff, int(elapsed_ms))
+    temp = path + ".tmp"
+    with open(temp, 'wb') as wfp:
+        wfp.write(header.ljust(HEADER_SIZE, b'\0'))
+        for plane in (board.mines, board.revealed, board.flagged):
+            wfp.write(pack_bits(plane))
+    os.replace(temp, path)
+
+
+def load(path) -> tuple:
+    """Return (board, elapsed_ms) for a save file, raises ValueError if it is not one."""
+    with open(path, 'rb') as rfp:
+        with mmap.mmap(rfp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < HEADER_SIZE or data[:4] != MAGIC:
+                raise ValueError("not a save file")
+            magic, width, height, mines, safe_radius, safe_index, seed, elapsed_ms = HEADER.unpack_from(data)
+            size = width*height
+            plane_size = (size+7)//8
+            if len(data) < HEADER_SIZE + 3*plane_size:
+                raise ValueError("truncated save file")
+
+            board = Board(width, height, mines, seed, safe_radius)
+            offset = HEADER_SIZE
+            for plane in (board.mines, board.revealed, board.flagged):
+                plane[:] = unpack_bits(data, offset, size)
+                offset += plane_size
+
+    board.safe_index = None if safe_index < 0 else safe_index
+    board.mine_indices = set_indices(board.mines)
+    board.flags = set(set_indices(board.flagged))
+    board.mines_placed = True
+    board.compute_counts()
+    board.recount()
+    return board, elapsed_ms
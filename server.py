@@ -0,0 +1,295 @@
+"""Minesweeper as a local service: many players, each with their own board.
+
+Requests and replies are JSON objects, one per line, over TCP or a Unix
+socket. Cells are flat indices ``y*width + x`` as in ``engine.Board``::
+
+    {"op": "new", "width": 9, "height": 9, "mines": 10, "seed": 7}
+        -> {"session": "3f2a...", "width": 9, "height": 9, "mines": 10, "seed": 7}
+    {"op": "reveal", "session": "3f2a...", "cell": 40, "id": 1}
+        -> {"id": 1, "status": 0, "changed": [[40, 0], [30, 1], ...]}
+    {"op": "flag", "cell": 0}       the session defaults to the last one created on the connection
+    {"op": "chord", "cell": 40}
+    {"op": "state"}                  every cell, as one code per cell
+    {"op": "restart"}                a fresh board of the same size, the session is kept
+    {"op": "close"}
+
+Replies to moves list only the cells the move changed, as ``[cell, code]``
+with the codes below, and the game status (``engine.STATUS_*``). The reply
+to the move that loses the game also lists every mine. An ``id`` in a
+request is echoed back, and failures answer ``{"error": ...}``.
+
+Moves go through ``replay.apply_action`` on an ``engine.Board``, the same
+rules the window plays by, with no pygame involved. A session is its board's
+byte columns plus a timestamp. Sessions live in an ``OrderedDict`` kept in
+order of last use, so evicting idle ones only looks at the oldest. Each
+connection is an ``asyncio.Protocol`` that answers every complete line of a
+read with one write::
+
+    python3 main.py serve --port 8765
+    python3 loadgen.py --port 8765 --sessions 2000
+"""
+import argparse, asyncio, collections, json, secrets, sys, time
+
+from engine import Board, STATUS_LOST
+from replay import REVEAL, FLAG, CHORD, apply_action
+
+
+ACTIONS = {"reveal": REVEAL, "flag": FLAG, "chord": CHORD}
+
+# cell codes in replies, 0-8 are revealed numbers
+CELL_FLAG = 9
+CELL_HIDDEN = 10
+CELL_MINE = 11
+
+# a connection sending a longer line than this without a newline is dropped
+MAX_LINE = 64*1024
+
+# built once, json.dumps() with arguments builds a new encoder for every call
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+_decode = json.JSONDecoder().decode
+
+
+def cell_code(board, index) -> int:
+    if board.revealed[index]:
+        return CELL_MINE if board.mines[index] else board.counts[index]
+    return CELL_FLAG if board.flagged[index] else CELL_HIDDEN
+
+
+def board_codes(board) -> str:
+    """Every cell of the board as one character, '0'-'8', 'F' flagged, '.' hidden and '*' mine."""
+    chars = "012345678F.*"
+    return "".join(chars[cell_code(board, index)] for index in range(board.size))
+
+
+class RequestError(Exception):
+    pass
+
+
+class Session:
+    __slots__ = ("key", "board", "touched")
+
+    def __init__(self, key, board, touched):
+        self.key = key
+        self.board = board
+        self.touched = touched
+
+
+class SessionStore:
+    """Sessions by key, oldest use first, so idle ones are found without a scan."""
+    def __init__(self, idle_timeout=300.0, max_sessions=100000, max_cells=10000):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        # moves run on the event loop, a flood fill over a 100x100 board holds it for about 25 ms
+        self.max_cells = max_cells
+        self.sessions = collections.OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def new_board(self, width, height, mines, seed=None, safe_radius=1) -> Board:
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (width, height, mines)):
+            raise RequestError("width, height and mines must be integers")
+        if width < 1 or height < 1 or width*height > self.max_cells:
+            raise RequestError(f"boards must have between 1 and {self.max_cells} cells")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)) or safe_radius not in (0, 1):
+            raise RequestError("bad seed or safe_radius")
+        return Board(width, height, max(mines, 0), seed, safe_radius)
+
+    def create(self, board, now) -> Session:
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evicted += 1
+        session = Session(secrets.token_hex(8), board, now)
+        self.sessions[session.key] = session
+        return session
+
+    def get(self, key, now) -> Session:
+        session = self.sessions.get(key)
+        if session is None:
+            raise RequestError("unknown session")
+        session.touched = now
+        self.sessions.move_to_end(key)
+        return session
+
+    def close(self, key) -> None:
+        self.sessions.pop(key, None)
+
+    def evict_idle(self, now) -> int:
+        sessions = self.sessions
+        limit = now - self.idle_timeout
+        count = 0
+        while sessions:
+            key, session = next(iter(sessions.items()))
+            if session.touched > limit:
+                break
+            del sessions[key]
+            count += 1
+        self.evicted += count
+        return count
+
+
+class GameServer:
+    def __init__(self, store):
+        self.store = store
+        self.requests = 0
+        self.moves = 0
+
+    def handle(self, request, connection) -> dict:
+        """Answer one decoded request, connection keeps the default session of its socket."""
+        if not isinstance(request, dict):
+            raise RequestError("requests must be JSON objects")
+        op = request.get("op")
+        # op and session are looked up in dicts, an unhashable value must not escape as a TypeError
+        if not isinstance(op, str):
+            raise RequestError("op must be a string")
+        store = self.store
+        now = time.monotonic()
+
+        if op == "new":
+            board = store.new_board(request.get("width", 9), request.get("height", 9), request.get("mines", 10),
+                                    request.get("seed"), request.get("safe_radius", 1))
+            session = store.create(board, now)
+            connection.session = session.key
+            return {"session": session.key, "width": board.width, "height": board.height,
+                    "mines": board.mine_count, "seed": board.seed}
+
+        key = request.get("session", connection.session)
+        if not isinstance(key, str):
+            raise RequestError("unknown session")
+        session = store.get(key, now)
+        board = session.board
+        kind = ACTIONS.get(op)
+        if kind is not None:
+            index = request.get("cell")
+            if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < board.size:
+                raise RequestError("cell out of range")
+            self.moves += 1
+            was_lost = board.exploded is not None
+            changed = apply_action(board, kind, index)
+            status = board.status()
+            if kind == FLAG:
+                cells = [[index, cell_code(board, index)] for index in changed]
+            else:
+                # reveals only ever uncover cells, and only the exploded one is a mine
+                counts = board.counts
+                cells = [[i, counts[i]] for i in changed]
+                if board.exploded is not None and not was_lost:
+                    cells[changed.index(board.exploded)][1] = CELL_MINE
+            reply = {"status": status, "changed": cells}
+            if status == STATUS_LOST and not was_lost:
+                reply["mines"] = board.mine_indices
+            return reply
+        if op == "state":
+            return {"session": key, "width": board.width, "height": board.height, "mines": board.mine_count,
+                    "seed": board.seed, "status": board.status(), "cells": board_codes(board)}
+        if op == "restart":
+            session.board = store.new_board(board.width, board.height, board.mine_count,
+                                            request.get("seed"), board.safe_radius)
+            return {"session": key, "seed": session.board.seed}
+        if op == "close":
+            store.close(key)
+            if connection.session == key:
+                connection.session = None
+            return {"session": key, "closed": True}
+        raise RequestError(f"unknown op {op!r}")
+
+    def respond(self, line, connection) -> bytes:
+        self.requests += 1
+        request = None
+        try:
+            request = _decode(line.decode())
+            reply = self.handle(request, connection)
+        except (ValueError, RecursionError):
+            # UnicodeDecodeError and JSONDecodeError are both ValueErrors, deeply nested arrays
+            # well under MAX_LINE exhaust the decoder's recursion limit
+            reply = {"error": "bad JSON"}
+        except RequestError as e:
+            reply = {"error": str(e)}
+        if isinstance(request, dict) and "id" in request:
+            reply["id"] = request["id"]
+        return (_encode(reply) + "\n").encode()
+
+
+class Connection(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.session = None
+        self.transport = None
+        self.buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            if len(buffer) > MAX_LINE:
+                self.transport.close()
+            return
+        lines = buffer[:end].split(b"\n")
+        del buffer[:end+1]
+        respond = self.server.respond
+        self.transport.write(b"".join([respond(line, self) for line in lines if line.strip()]))
+
+    # stop reading from a client that does not read its replies
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+async def housekeeping(server, interval) -> None:
+    """Evict idle sessions, and print a load line every interval seconds when there was traffic."""
+    store = server.store
+    last_time = time.monotonic()
+    last_requests = 0
+    while True:
+        await asyncio.sleep(min(interval or 1.0, max(store.idle_timeout/4, 0.1)))
+        now = time.monotonic()
+        store.evict_idle(now)
+        if interval and now - last_time >= interval:
+            if server.requests != last_requests:
+                rate = (server.requests - last_requests)/(now - last_time)
+                print(f"{len(store):>8} sessions  {rate:10.0f} requests/s  {server.moves:>12} moves  "
+                      f"{store.evicted:>8} evicted", file=sys.stderr, flush=True)
+            last_time = now
+            last_requests = server.requests
+
+
+async def serve(args) -> None:
+    server = GameServer(SessionStore(args.idle_timeout, args.max_sessions, args.max_cells))
+    loop = asyncio.get_running_loop()
+    if args.unix:
+        listener = await loop.create_unix_server(lambda: Connection(server), args.unix)
+        where = args.unix
+    else:
+        listener = await loop.create_server(lambda: Connection(server), args.host, args.port)
+        where = f"{args.host}:{args.port}"
+    print(f"serving on {where}", file=sys.stderr, flush=True)
+    async with listener:
+        await housekeeping(server, args.interval)
+
+
+def main_server(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an unused session is dropped")
+    parser.add_argument("--max-sessions", type=int, default=100000, help="the least recently used session goes past this")
+    parser.add_argument("--max-cells", type=int, default=10000,
+                        help="largest board a session may ask for, every move on it blocks all other sessions")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between load lines, 0 for none")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main_server()
@@ -0,0 +1,168 @@
+"""Monte Carlo win-rate estimates for a board configuration.
+
+Plays many headless games with the solver's deterministic strategy (reveal
+every cell proven safe, otherwise the lowest-risk guess) and streams running
+aggregates with confidence intervals while it goes. Batches of games are
+spread over a ``multiprocessing`` pool. Workers only send back integer sums,
+so the totals do not depend on the worker count or the order batches finish.
+
+Game ``i`` is played on the board seeded ``master_seed * 2**32 + i``, which
+makes any run reproducible from ``--seed`` and lets a single game be replayed
+with ``engine.new_game(w, h, mines, seed)``::
+
+    python3 simulate.py --board 30x16 --mines 99 --games 1000000 --seed 7
+    python3 main.py simulate --board 9x9 --mines 10 --first corner
+"""
+import argparse, json, math, multiprocessing, os, random, statistics, sys, time
+
+from engine import STATUS_WON, new_game
+from solver import Solver
+
+
+FIRST_CLICK_POLICIES = ("centre", "corner", "random")
+
+# integer totals gathered from every batch
+FIELDS = ("games", "wins", "revealed", "revealed_sq", "guesses", "guess_games")
+
+
+def game_seed(master_seed, game) -> int:
+    return master_seed*2**32 + game
+
+
+def first_click(board, policy, seed) -> int:
+    if policy == "corner":
+        return 0
+    if policy == "random":
+        return random.Random(seed).randrange(board.size)
+    return board.index(board.width//2, board.height//2)
+
+
+def play_game(width, height, mines, seed, policy="centre", safe_radius=1) -> tuple:
+    """Play one game to the end, returns (won, safe cells revealed, guesses made)."""
+    board = new_game(width, height, mines, seed, safe_radius)
+    board.reveal_index(first_click(board, policy, seed))
+    solver = Solver(board)
+    guesses = 0
+    while board.exploded is None and board.safe_left:
+        cell, p = solver.hint()
+        if cell is None:
+            break
+        if p > 0:
+            guesses += 1
+        solver.update(board.reveal_index(cell))
+
+    revealed = board.size - board.mine_count - board.safe_left
+    return board.status() == STATUS_WON, revealed, guesses
+
+
+def play_batch(task) -> dict:
+    """Worker entry point: play games [start, stop) and return their integer totals."""
+    width, height, mines, policy, safe_radius, master_seed, start, stop = task
+    totals = dict.fromkeys(FIELDS, 0)
+    for game in range(start, stop):
+        won, revealed, guesses = play_game(width, height, mines, game_seed(master_seed, game), policy, safe_radius)
+        totals["games"] += 1
+        totals["wins"] += won
+        totals["revealed"] += revealed
+        totals["revealed_sq"] += revealed*revealed
+        totals["guesses"] += guesses
+        totals["guess_games"] += guesses > 0
+    return totals
+
+
+def wilson_interval(successes, n, z) -> tuple:
+    """Wilson score interval for a binomial proportion, sound near 0 and 1 unlike the normal one."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes/n
+    centre = (p + z*z/(2*n)) / (1 + z*z/n)
+    margin = z*math.sqrt(p*(1-p)/n + z*z/(4*n*n)) / (1 + z*z/n)
+    return max(0.0, centre-margin), min(1.0, centre+margin)
+
+
+def summarize(totals, safe_cells, confidence) -> dict:
+    n = totals["games"]
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence/2)
+    low, high = wilson_interval(totals["wins"], n, z)
+    mean = totals["revealed"]/n if n else 0.0
+    variance = (totals["revealed_sq"]/n - mean*mean) if n else 0.0
+    margin = z*math.sqrt(max(variance, 0.0)/n) if n else 0.0
+    return {
+        "games": n,
+        "win_rate": totals["wins"]/n if n else 0.0,
+        "win_rate_ci": [low, high],
+        "progress": mean/safe_cells,
+        "progress_ci": [(mean-margin)/safe_cells, (mean+margin)/safe_cells],
+        "guesses_per_game": totals["guesses"]/n if n else 0.0,
+        "games_needing_guess": totals["guess_games"]/n if n else 0.0,
+    }
+
+
+def format_line(summary, elapsed, confidence) -> str:
+    low, high = summary["win_rate_ci"]
+    rate = summary["games"]/elapsed if elapsed > 0 else 0.0
+    return (f"{summary['games']:>10} games  win {summary['win_rate']:7.3%} "
+            f"[{low:7.3%}, {high:7.3%}] {confidence:.0%} CI  "
+            f"progress {summary['progress']:6.2%}  guesses/game {summary['guesses_per_game']:5.2f}  "
+            f"{rate:8.0f} games/s")
+
+
+def tasks(args):
+    for start in range(0, args.games, args.batch):
+        yield (args.width, args.height, args.mines, args.first, args.safe_radius,
+               args.seed, start, min(start+args.batch, args.games))
+
+
+def main_simulate(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--board", default="9x9", help="board size as WIDTHxHEIGHT")
+    parser.add_argument("--mines", type=int, default=10)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--first", choices=FIRST_CLICK_POLICIES, default="centre", help="first-click policy")
+    parser.add_argument("--safe-radius", type=int, choices=(0, 1), default=1,
+                        help="0 keeps only the first cell free of mines, 1 its 3x3 block")
+    parser.add_argument("--seed", type=int, default=1, help="master seed, game i uses seed*2**32 + i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes, 1 runs in-process")
+    parser.add_argument("--batch", type=int, default=250, help="games per task sent to a worker")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between progress lines")
+    parser.add_argument("--output", help="write the final JSON summary here")
+    args = parser.parse_args(argv)
+    args.width, args.height = (int(v) for v in args.board.lower().split("x"))
+    safe_cells = args.width*args.height - min(args.mines, args.width*args.height-1)
+
+    totals = dict.fromkeys(FIELDS, 0)
+    start = last = time.perf_counter()
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    results = pool.imap_unordered(play_batch, tasks(args)) if pool else map(play_batch, tasks(args))
+    try:
+        for batch in results:
+            for field in FIELDS:
+                totals[field] += batch[field]
+            now = time.perf_counter()
+            if now - last >= args.interval:
+                last = now
+                print(format_line(summarize(totals, safe_cells, args.confidence), now-start, args.confidence),
+                      file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        print("interrupted, partial results", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    elapsed = time.perf_counter() - start
+    summary = summarize(totals, safe_cells, args.confidence)
+    print(format_line(summary, elapsed, args.confidence))
+    report = {"board": [args.width, args.height], "mines": args.mines, "first": args.first,
+              "safe_radius": args.safe_radius, "seed": args.seed, "workers": args.workers,
+              "confidence": args.confidence, "elapsed_s": elapsed}
+    report.update(summary)
+    if args.output:
+        with open(args.output, 'w') as wfp:
+            json.dump(report, wfp, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main_simulate()
@@ -0,0 +1,428 @@
+"""Constraint solver, hint engine and auto-player for an ``engine.Board``.
+
+Every revealed number is a constraint "exactly ``remaining`` of these unknown
+cells are mines". The solver keeps those constraints up to date incrementally:
+``update(changed)`` only refreshes the numbers around cells that changed, then
+propagates the two cheap rules (a constraint that is all-safe or all-mines, and
+the subset rule between overlapping constraints).
+
+When that is not enough, ``probabilities()`` splits the frontier into
+independent components, enumerates each one exactly (results are cached per
+component, so untouched parts of the board are not solved again) and combines
+them with the count of unconstrained cells to get per-cell mine probabilities.
+A cell that is a mine in every solution the mine count allows, or in none, is
+promoted to a definite mine or safe cell. That includes the unconstrained
+cells, which the mine count alone can settle in the endgame.
+
+Player flags are guesses, so they are ignored unless ``trust_flags`` is set.
+"""
+import collections, math
+
+
+# components with more cells than this are not enumerated
+ENUMERATION_LIMIT = 40
+# backtracking nodes allowed per component before giving up
+ENUMERATION_BUDGET = 200000
+# with more components than this, use the factorised weighting instead of the exact convolution
+EXACT_COMPONENTS_LIMIT = 12
+
+
+class Solver:
+    def __init__(self, board, trust_flags=False):
+        self.board = board
+        self.trust_flags = trust_flags
+        self.mines = set()
+        self.safe = set()
+        # number cell -> (unknown neighbour cells, mines left among them)
+        self.constraints = {}
+        # unknown cell -> number cells constraining it
+        self.cell_constraints = collections.defaultdict(set)
+        self.component_cache = {}
+        self.version = 0
+        self.prob_version = -1
+        self.prob_cache = ({}, 0.0)
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Read the whole board once, later changes arrive through update()."""
+        board = self.board
+        self.mines.clear()
+        self.safe.clear()
+        self.constraints.clear()
+        self.cell_constraints.clear()
+        if self.trust_flags:
+            self.mines.update(board.flags)
+        pending = set()
+        revealed = board.revealed
+        for index in range(board.size):
+            if revealed[index] and not board.mines[index] and board.counts[index]:
+                pending.add(index)
+        self.propagate(pending)
+
+    def is_unknown(self, index) -> bool:
+        return not self.board.revealed[index] and index not in self.mines and index not in self.safe
+
+    def update(self, changed) -> None:
+        """Fold a list of changed cells (as returned by the engine) into the constraints."""
+        board = self.board
+        revealed = board.revealed
+        pending = set()
+        for index in changed:
+            if self.trust_flags:
+                if board.flagged[index]:
+                    self.mines.add(index)
+                elif index in self.mines and not revealed[index]:
+                    self.mines.discard(index)
+            if revealed[index]:
+                self.safe.discard(index)
+                if board.mines[index]:
+                    # a revealed mine ends the game but is still a known mine
+                    self.mines.add(index)
+                elif board.counts[index]:
+                    pending.add(index)
+            for neighbor in board.neighbors(index):
+                if neighbor in self.constraints:
+                    pending.add(neighbor)
+        self.propagate(pending)
+
+    def refresh(self, number) -> bool:
+        """Recompute one number's constraint, returns True if it changed."""
+        board = self.board
+        unknown = []
+        remaining = board.counts[number]
+        for neighbor in board.neighbors(number):
+            if neighbor in self.mines:
+                remaining -= 1
+            elif self.is_unknown(neighbor):
+                unknown.append(neighbor)
+        unknown = frozenset(unknown)
+
+        old = self.constraints.get(number)
+        if old is not None and old == (unknown, remaining):
+            return False
+        if old is not None:
+            for cell in old[0]:
+                owners = self.cell_constraints.get(cell)
+                if owners is not None:
+                    owners.discard(number)
+        if unknown:
+            self.constraints[number] = (unknown, remaining)
+            for cell in unknown:
+                self.cell_constraints[cell].add(number)
+        elif old is not None:
+            del self.constraints[number]
+        return True
+
+    def mark(self, cells, is_mine, pending) -> None:
+        for cell in cells:
+            if not self.is_unknown(cell):
+                continue
+            (self.mines if is_mine else self.safe).add(cell)
+            pending.update(self.cell_constraints.pop(cell, ()))
+
+    def propagate(self, pending) -> None:
+        """Apply the single-constraint and subset rules until nothing new follows."""
+        while pending:
+            number = pending.pop()
+            if not self.refresh(number) or number not in self.constraints:
+                continue
+            self.version += 1
+            cells, remaining = self.constraints[number]
+            if remaining == 0:
+                self.mark(cells, False, pending)
+                continue
+            if remaining == len(cells):
+                self.mark(cells, True, pending)
+                continue
+
+            overlapping = set()
+            for cell in cells:
+                overlapping.update(self.cell_constraints.get(cell, ()))
+            overlapping.discard(number)
+            for other in overlapping:
+                other_cells, other_remaining = self.constraints[other]
+                for small, small_r, big, big_r in ((cells, remaining, other_cells, other_remaining),
+                                                   (other_cells, other_remaining, cells, remaining)):
+                    if small < big:
+                        rest = big - small
+                        if big_r == small_r:
+                            self.mark(rest, False, pending)
+                        elif big_r - small_r == len(rest):
+                            self.mark(rest, True, pending)
+
+    def components(self) -> list:
+        """Split the constrained cells into independent groups of (cells, constraints)."""
+        seen = set()
+        groups = []
+        for start in self.constraints:
+            if start in seen:
+                continue
+            seen.add(start)
+            numbers = [start]
+            cells = set()
+            stack = [start]
+            while stack:
+                number = stack.pop()
+                for cell in self.constraints[number][0]:
+                    if cell in cells:
+                        continue
+                    cells.add(cell)
+                    for other in self.cell_constraints[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            numbers.append(other)
+                            stack.append(other)
+            groups.append((sorted(cells), sorted(numbers)))
+        return groups
+
+    def enumerate_component(self, cells, numbers) -> dict:
+        """Count the solutions of one component, by number of mines.
+
+        Returns {mines: (solutions, [mine count per cell])}, or None if the component
+        is too large to enumerate.
+        """
+        key = tuple((self.constraints[n][0], self.constraints[n][1]) for n in numbers)
+        cached = self.component_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(cells) > ENUMERATION_LIMIT:
+            return None
+
+        position = {cell: i for i, cell in enumerate(cells)}
+        cons = []
+        cell_cons = [[] for _ in cells]
+        for n in numbers:
+            members, remaining = self.constraints[n]
+            ci = len(cons)
+            cons.append([remaining, len(members)])
+            for cell in members:
+                cell_cons[position[cell]].append(ci)
+
+        result = {}
+        assignment = [0]*len(cells)
+        budget = [ENUMERATION_BUDGET]
+
+        def search(i, mines):
+            budget[0] -= 1
+            if budget[0] < 0:
+                raise OverflowError
+            if i == len(cells):
+                entry = result.get(mines)
+                if entry is None:
+                    entry = result[mines] = [0, [0]*len(cells)]
+                entry[0] += 1
+                per_cell = entry[1]
+                for j, value in enumerate(assignment):
+                    per_cell[j] += value
+                return
+            for value in (0, 1):
+                ok = True
+                for ci in cell_cons[i]:
+                    need, free = cons[ci]
+                    need -= value
+                    free -= 1
+                    if need < 0 or need > free:
+                        ok = False
+                        break
+                if not ok:
+                    continue
+                for ci in cell_cons[i]:
+                    cons[ci][0] -= value
+                    cons[ci][1] -= 1
+                assignment[i] = value
+                search(i+1, mines+value)
+                for ci in cell_cons[i]:
+                    cons[ci][0] += value
+                    cons[ci][1] += 1
+            assignment[i] = 0
+
+        try:
+            search(0, 0)
+        except OverflowError:
+            return None
+
+        result = {k: (v[0], v[1]) for k, v in result.items()}
+        if len(self.component_cache) > 4096:
+            self.component_cache.clear()
+        self.component_cache[key] = result
+        return result
+
+    def probabilities(self) -> tuple:
+        """Return ({cell: mine probability} for constrained cells, probability of any other unknown cell).
+
+        Cells found to be certain are moved into ``mines`` / ``safe`` on the way.
+        """
+        if self.prob_version == self.version:
+            return self.prob_cache
+
+        board = self.board
+        groups = self.components()
+        solved = []
+        loose = []
+        for cells, numbers in groups:
+            dist = self.enumerate_component(cells, numbers)
+            if dist:
+                solved.append((cells, dist))
+            else:
+                loose.append(cells)
+
+        constrained = sum(len(cells) for cells, numbers in groups)
+        unknown_total = board.revealed.count(0) - len(self.mines) - len(self.safe)
+        interior = max(unknown_total - constrained, 0)
+        mines_left = board.mine_count - len(self.mines)
+
+        # least and most mines each component can hold, an unenumerated one anything up to its size.
+        # Sums of these ranges can only overstate what the mine count allows, never rule out too much
+        spans = [(min(dist), max(dist)) for cells, dist in solved] + [(0, len(cells)) for cells in loose]
+        low = sum(span[0] for span in spans)
+        high = sum(span[1] for span in spans)
+
+        probs = {}
+        expected = 0.0
+        certain_safe = []
+        certain_mine = []
+        weights = self.component_weights(solved, interior, mines_left)
+        for (cells, dist), weight, span in zip(solved, weights, spans):
+            solutions = sum(v[0] for v in dist.values())
+            total = sum(dist[k][0]*weight[k] for k in dist)
+            # mine totals of this component that the others and the interior can make up the mine count with
+            others_low = low - span[0]
+            others_high = high - span[1]
+            allowed = [k for k in dist if max(others_low, mines_left-k-interior) <= min(others_high, mines_left-k)]
+            for j, cell in enumerate(cells):
+                # certainty comes from the solution counts alone, never from rounded weights
+                mine_solutions = sum(v[1][j] for v in dist.values())
+                if all(dist[k][1][j] == 0 for k in allowed or dist):
+                    certain_safe.append(cell)
+                elif all(dist[k][1][j] == dist[k][0] for k in allowed or dist):
+                    certain_mine.append(cell)
+                if total > 0:
+                    p = sum(dist[k][1][j]*weight[k] for k in dist) / total
+                else:
+                    p = mine_solutions / solutions
+                probs[cell] = p
+                expected += p
+        for cells in loose:
+            for cell in cells:
+                p = max(self.constraints[n][1]/len(self.constraints[n][0]) for n in self.cell_constraints[cell])
+                probs[cell] = p
+                expected += p
+
+        interior_p = min(max((mines_left - expected)/interior, 0.0), 1.0) if interior else 0.0
+        if interior:
+            # the mines the frontier cannot hold are in the interior, when that is none or all of it every
+            # unconstrained cell is known. Only happens near the end, so the board scan is rare
+            least = max(0, mines_left - high)
+            most = min(interior, mines_left - low)
+            if least <= most and (most == 0 or least == interior):
+                frontier = set()
+                for cells, numbers in groups:
+                    frontier.update(cells)
+                rest = [cell for cell in range(board.size) if cell not in frontier and self.is_unknown(cell)]
+                if len(rest) == interior:
+                    (certain_safe if most == 0 else certain_mine).extend(rest)
+                    interior_p = 0.0 if most == 0 else 1.0
+
+        pending = set()
+        self.mark(certain_safe, False, pending)
+        self.mark(certain_mine, True, pending)
+        for cell in certain_safe:
+            probs[cell] = 0.0
+        for cell in certain_mine:
+            probs[cell] = 1.0
+        self.propagate(pending)
+
+        self.prob_cache = (probs, interior_p)
+        self.prob_version = self.version
+        return self.prob_cache
+
+    def component_weights(self, solved, interior, mines_left) -> list:
+        """Relative weight of k mines in each component, given every other component and the interior."""
+        def log_comb(n, k):
+            if k < 0 or k > n:
+                return None
+            return math.lgamma(n+1) - math.lgamma(k+1) - math.lgamma(n-k+1)
+
+        if len(solved) > EXACT_COMPONENTS_LIMIT:
+            # factorised approximation, each extra frontier mine costs the interior odds
+            ratio = 1.0
+            if interior:
+                density = min(max(mines_left/(interior + sum(len(c) for c, d in solved)), 1e-9), 1-1e-9)
+                ratio = density/(1-density)
+            return [{k: ratio**k for k in dist} for cells, dist in solved]
+
+        # exact: convolve every other component's mine distribution, weight by C(interior, rest)
+        norm = [{k: v[0] for k, v in dist.items()} for cells, dist in solved]
+        for d in norm:
+            s = sum(d.values())
+            for k in d:
+                d[k] /= s
+
+        def convolve(a, b):
+            out = collections.defaultdict(float)
+            for i, x in a.items():
+                for j, y in b.items():
+                    out[i+j] += x*y
+            return out
+
+        prefix = [{0: 1.0}]
+        for d in norm:
+            prefix.append(convolve(prefix[-1], d))
+        suffix = [{0: 1.0}]
+        for d in reversed(norm):
+            suffix.append(convolve(suffix[-1], d))
+        suffix.reverse()
+
+        all_logs = [log_comb(interior, mines_left - k) for k in range(mines_left+1)]
+        finite = [v for v in all_logs if v is not None]
+        top = max(finite) if finite else 0.0
+        interior_weight = [math.exp(v-top) if v is not None else 0.0 for v in all_logs]
+
+        def interior_at(total):
+            return interior_weight[total] if 0 <= total <= mines_left else 0.0
+
+        weights = []
+        for i, (cells, dist) in enumerate(solved):
+            others = convolve(prefix[i], suffix[i+1])
+            weights.append({k: sum(p*interior_at(k+j) for j, p in others.items()) for k in dist})
+        return weights
+
+    def safe_moves(self) -> list:
+        return [cell for cell in self.safe if not self.board.revealed[cell]]
+
+    def hint(self) -> tuple:
+        """Return (cell, mine probability) for the best next reveal, or (None, None)."""
+        safe = self.safe_moves()
+        if safe:
+            return min(safe), 0.0
+        probs, interior_p = self.probabilities()
+        safe = self.safe_moves()
+        if safe:
+            return min(safe), 0.0
+
+        best = None
+        best_p = 2.0
+        for cell, p in probs.items():
+            if p < best_p and self.is_unknown(cell):
+                best, best_p = cell, p
+        if interior_p < best_p:
+            board = self.board
+            for cell in range(board.size):
+                if self.is_unknown(cell) and cell not in probs:
+                    return cell, interior_p
+        return best, (best_p if best is not None else None)
+
+
+def autoplay(board, first=None) -> int:
+    """Play a board to the end as fast as possible, guessing only when no safe cell is known."""
+    if first is None:
+        first = board.index(board.width//2, board.height//2)
+    board.reveal_index(first)
+    solver = Solver(board)
+
+    while board.exploded is None and board.safe_left:
+        cell, p = solver.hint()
+        if cell is None:
+            break
+        solver.update(board.reveal_index(cell))
+    return board.status()
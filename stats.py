@@ -0,0 +1,126 @@
+"""Per-game results kept in SQLite, with the queries behind the stats screen.
+
+``ResultsStore.record()`` only queues the result. A writer thread drains the
+queue and inserts everything waiting in one transaction, so finishing a game
+never waits on the disk. Reads use their own connection (the database is in
+WAL mode, so they do not block on the writer). Best times come from an index
+that keeps each board's games in time order, so only the rows shown are
+looked up in the table. The per-style and per-board totals are kept up to
+date by an insert trigger, so the stats screen queries stay well under a
+millisecond with hundreds of thousands of games::
+
+    store = ResultsStore("stats.db")
+    store.record(style=0, width=9, height=9, mines=10, seed=1, time_ms=31000, won=True, clicks=40)
+    store.best_times(9, 9, 10)
+    store.win_rate_by_style()
+"""
+import queue, sqlite3, threading, time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    style INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    seed INTEGER,
+    time_ms INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    clicks INTEGER NOT NULL,
+    assisted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS games_board_time ON games (width, height, mines, won, assisted, time_ms);
+CREATE TABLE IF NOT EXISTS style_totals (
+    style INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS board_totals (
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    PRIMARY KEY (width, height, mines)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS games_totals AFTER INSERT ON games BEGIN
+    INSERT INTO style_totals VALUES (NEW.style, 1, NEW.won)
+        ON CONFLICT (style) DO UPDATE SET games = games + 1, wins = wins + NEW.won;
+    INSERT INTO board_totals VALUES (NEW.width, NEW.height, NEW.mines, 1, NEW.won)
+        ON CONFLICT (width, height, mines) DO UPDATE SET games = games + 1, wins = wins + NEW.won;
+END;
+"""
+
+COLUMNS = ("played_at", "style", "width", "height", "mines", "seed", "time_ms", "won", "clicks", "assisted")
+
+# the writer inserts at most this many queued results per transaction
+BATCH_SIZE = 1000
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self.reader = sqlite3.connect(path)
+        self.reader.execute("PRAGMA journal_mode=WAL")
+        self.reader.executescript(SCHEMA)
+        self.pending = queue.SimpleQueue()
+        self.thread = None
+
+    def record(self, style, width, height, mines, seed, time_ms, won, clicks, assisted=False) -> None:
+        """Queue one finished game for the writer thread."""
+        if seed is not None and not -2**63 <= seed < 2**63:
+            seed = None
+        self.pending.put((time.time(), style, width, height, mines, seed, int(time_ms), int(won), clicks, int(assisted)))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.writer, daemon=True)
+            self.thread.start()
+
+    def writer(self) -> None:
+        connection = sqlite3.connect(self.path)
+        insert = f"INSERT INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?'*len(COLUMNS))})"
+        running = True
+        while running:
+            batch = [self.pending.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [row for row in batch if row is not None]
+            try:
+                with connection:
+                    connection.executemany(insert, batch)
+            except sqlite3.Error as e:
+                print(f"Results not saved: {e}")
+        connection.close()
+
+    def close(self) -> None:
+        """Write out everything still queued and stop the writer."""
+        if self.thread is not None:
+            self.pending.put(None)
+            self.thread.join()
+            self.thread = None
+        self.reader.close()
+
+    def best_times(self, width, height, mines, limit=10) -> list:
+        """Fastest unassisted wins on one board configuration, as (time_ms, played_at, clicks)."""
+        return self.reader.execute(
+            "SELECT time_ms, played_at, clicks FROM games"
+            " WHERE width = ? AND height = ? AND mines = ? AND won = 1 AND assisted = 0"
+            " ORDER BY time_ms LIMIT ?", (width, height, mines, limit)).fetchall()
+
+    def win_rate_by_style(self) -> list:
+        """(style, games, wins) for every style with recorded games."""
+        return self.reader.execute(
+            "SELECT style, games, wins FROM style_totals ORDER BY style").fetchall()
+
+    def board_totals(self, width, height, mines) -> tuple:
+        """(games, wins) on one board configuration."""
+        row = self.reader.execute(
+            "SELECT games, wins FROM board_totals WHERE width = ? AND height = ? AND mines = ?",
+            (width, height, mines)).fetchone()
+        return row or (0, 0)